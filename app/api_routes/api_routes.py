@@ -7,11 +7,12 @@ from typing import List
 from fastapi.responses import StreamingResponse
 import httpx
 
-from fastapi import APIRouter, HTTPException, File, UploadFile, Form
+from fastapi import APIRouter, HTTPException, File, UploadFile, Form, BackgroundTasks
 from pydantic import BaseModel
 
 from ..config import OPENAI_API_KEY
 from ..model_utils.predict_learning_style import predict_learning_style
+from ..imageProcessing.image_preprocessing import preprocess_images
 from ..openaiCustomAPI.text_to_speech import text_to_speech
 from ..openaiCustomAPI.speech_to_text import speech_to_text
 from ..tokenExtractor.pdf_extractor import extract_tokens_from_pdf
@@ -23,7 +24,9 @@ from ..openaiCustomAPI.generate_content import (
     get_module_content_from_openai
 )
 from ..firebaseHandling.firebaseHandling import create_module_with_submodules, bucket, create_user, get_admin_students, \
-    delete_user, add_users_to_module, extract_text_from_image
+    delete_user, add_users_to_module, extract_text_from_image, create_users_bulk, start_user_deletion_job, \
+    delete_users_bulk, get_user_deletion_job, get_user_modules, get_module_content, get_submodule_lesson, \
+    update_submodule_progress, get_class_progress
 
 import tempfile
 import os
@@ -62,6 +65,17 @@ class SignUpRequest(BaseModel):
     adminUid: str = None
 
 
+class BulkSignUpUser(BaseModel):
+    email: str
+    password: str
+    admin: bool = False
+
+
+class BulkSignUpRequest(BaseModel):
+    users: List[BulkSignUpUser]
+    adminUid: str = None
+
+
 @api_router.delete("/user/{user_uid}")
 def delete_user_endpoint(user_uid: str):
     try:
@@ -71,6 +85,31 @@ def delete_user_endpoint(user_uid: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class BulkDeleteUsersRequest(BaseModel):
+    userIds: List[str]
+
+
+@api_router.post("/users/delete-bulk", status_code=202)
+def delete_users_bulk_route(data: BulkDeleteUsersRequest, background_tasks: BackgroundTasks):
+    user_uids = list(dict.fromkeys(data.userIds))
+    if not user_uids:
+        raise HTTPException(status_code=400, detail="Missing userIds")
+    try:
+        job_id = start_user_deletion_job(user_uids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    background_tasks.add_task(delete_users_bulk, job_id, user_uids)
+    return {"jobId": job_id, "total": len(user_uids)}
+
+
+@api_router.get("/users/delete-bulk/{job_id}")
+def get_delete_users_job_route(job_id: str):
+    job = get_user_deletion_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Deletion job not found")
+    return job
+
+
 class AddUsersToModuleRequest(BaseModel):
     moduleId: str
     userIds: list[str]
@@ -88,6 +127,33 @@ def add_users_to_module_route(data: AddUsersToModuleRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class SubmoduleProgressRequest(BaseModel):
+    userUid: str
+    submoduleId: str
+    completionPercentage: float
+    progressStatus: str = None
+
+
+@api_router.post("/updateSubmoduleProgress")
+def update_submodule_progress_route(data: SubmoduleProgressRequest):
+    try:
+        module_progress = update_submodule_progress(data.userUid, data.submoduleId,
+                                                    data.completionPercentage, data.progressStatus)
+        return {"ok": True, "moduleProgress": module_progress}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/admin/{admin_uid}/class-progress")
+def get_class_progress_route(admin_uid: str):
+    try:
+        return {"modules": get_class_progress(admin_uid)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @api_router.get("/admin/{admin_uid}/students")
 def get_admin_students_route(admin_uid: str):
     try:
@@ -101,6 +167,30 @@ def get_admin_students_route(admin_uid: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@api_router.get("/user/{user_uid}/modules")
+def get_user_modules_route(user_uid: str):
+    try:
+        return {"modules": get_user_modules(user_uid)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@api_router.get("/modules/{module_id}/content")
+def get_module_content_route(module_id: str):
+    content = get_module_content(module_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Module content not found")
+    return {"moduleId": module_id, "content": content}
+
+
+@api_router.get("/submodules/{submodule_id}/lesson")
+def get_submodule_lesson_route(submodule_id: str):
+    lesson = get_submodule_lesson(submodule_id)
+    if lesson is None:
+        raise HTTPException(status_code=404, detail="Submodule not found")
+    return {"submoduleId": submodule_id, **lesson}
+
+
 @api_router.post("/signup-users")
 async def signup_user(request: SignUpRequest):
     # try:
@@ -112,6 +202,22 @@ async def signup_user(request: SignUpRequest):
     #     raise HTTPException(status_code=500, detail=str(e))
 
 
+@api_router.post("/signup-users/bulk")
+def signup_users_bulk(request: BulkSignUpRequest):
+    if not request.users:
+        raise HTTPException(status_code=400, detail="No users provided")
+    try:
+        outcome = create_users_bulk(request.users, request.adminUid)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    results = outcome["results"]
+    created = sum(1 for result in results if result["ok"])
+    return {"created": created, "failed": len(results) - created, "results": results,
+            "rosterError": outcome["rosterError"]}
+
+
 @api_router.post("/session")
 async def get_session(data: Content):
     async with httpx.AsyncClient() as client:
@@ -180,11 +286,22 @@ def generate_random_document_name():
     return document_name
 
 
+async def extract_text_from_images(contents):
+    """
+    Preprocess images in the worker pool, then run OCR on all of them
+    concurrently and join the text in page order.
+    """
+    processed = await preprocess_images(contents)
+    texts = await asyncio.gather(*(asyncio.to_thread(extract_text_from_image, content) for content in processed))
+    return "\n\n".join(text for text in texts if text) or None
+
+
 @api_router.post("/upload-file")
 async def upload_file(
         useruid: str = Form(...),
         submodulepreference: list = Form(...),
-        file: UploadFile = File(...)
+        file: UploadFile = File(...),
+        files: List[UploadFile] = File(None)
 ):
     tokens = None
     print("submodulepreference:", submodulepreference)
@@ -203,6 +320,14 @@ async def upload_file(
             status_code=400,
             detail="File must be a PDF, an image, or an audio file"
         )
+    # Extra files are additional pages of a multi-image upload.
+    extra_files = files or []
+    if extra_files and (file.content_type not in ["image/jpeg", "image/png"] or
+                        any(extra.content_type not in ["image/jpeg", "image/png"] for extra in extra_files)):
+        raise HTTPException(
+            status_code=400,
+            detail="Multiple files can only be uploaded as JPEG or PNG images"
+        )
 
     # Read file content once.
     file_content = await file.read()
@@ -213,7 +338,8 @@ async def upload_file(
         tokens = extract_tokens_from_pdf(file_content)
     elif file.content_type in ["image/jpeg", "image/png"]:
         print("Processing image file using Cloud Vision extension...")
-        tokens = extract_text_from_image(file_content)
+        image_contents = [file_content] + [await extra.read() for extra in extra_files]
+        tokens = await extract_text_from_images(image_contents)
         print("image tokens", tokens)
     elif file.content_type in ["audio/wav", "audio/mpeg", "audio/mp3", "audio/mp4"]:
         print("Processing audio file...")
@@ -255,7 +381,7 @@ async def upload_file(
                 "name": "Flash Cards",
                 "description": "Learn the principles of your course through repetitive learning flash cards",
                 "type": "kinaesthetic",
-                "lessonData": f"{flashcard_json}"
+                "lessonData": flashcard_json
             })
         # If the user selected a "Visual" preference, create the Mind Map submodule.
         if "Visual" in preference:
@@ -266,7 +392,7 @@ async def upload_file(
                 "name": "Mind Map",
                 "description": "Explore the different ways of learning your course through a mind map",
                 "type": "visual",
-                "lessonData": f"{mindmap_json}"
+                "lessonData": mindmap_json
             })
         # If the user selected an "Auditory" preference, create the Podcast Session submodule.
         if "Auditory" in preference:
@@ -302,7 +428,7 @@ async def upload_file(
             "name": "Multiple Choice Quiz",
             "description": "Complete Multiple Choice Quiz to complete the module",
             "type": "quiz",
-            "lessonData": f"{quiz_json}",
+            "lessonData": quiz_json,
         })
         modules = ["Flashcard", "Podcast", "Mindmap", "Quiz", "Module"]
         input_cost_per_token = 1.10 / 1_000_000
@@ -0,0 +1,22 @@
+"""
+Rebuilds the moduleProgress and classStats aggregates from the per-submodule
+progress documents. Run from the repository root:
+
+    python -m app.firebaseHandling.backfill_progress_aggregates --dry-run
+    python -m app.firebaseHandling.backfill_progress_aggregates
+"""
+
+import argparse
+
+from .firebaseHandling import backfill_progress_aggregates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild module progress aggregates and class counters.")
+    parser.add_argument("--dry-run", action="store_true", help="Compute the aggregates without writing them")
+    args = parser.parse_args()
+    backfill_progress_aggregates(dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
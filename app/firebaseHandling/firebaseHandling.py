@@ -1,5 +1,10 @@
+import ast
+import gzip
+import hashlib
+import json
 import os
-import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from http.client import HTTPException
 
@@ -7,7 +12,7 @@ import firebase_admin
 from firebase_admin import credentials, firestore, storage
 from google.cloud.firestore_v1 import SERVER_TIMESTAMP
 from firebase_admin import auth
-from google.cloud.firestore_v1 import ArrayUnion
+from google.cloud.firestore_v1 import ArrayUnion, ArrayRemove, DELETE_FIELD, Increment
 
 # Initialize Firebase Admin SDK
 cred = credentials.Certificate(
@@ -23,6 +28,30 @@ import time
 from firebase_admin import firestore
 
 
+# Leading bytes of the image formats Cloud Vision reads, with their content
+# type and file extension. Uploads are labelled by what the bytes actually are,
+# since images that could not be re-encoded are uploaded unchanged.
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", "png"),
+    (b"GIF87a", "image/gif", "gif"),
+    (b"GIF89a", "image/gif", "gif"),
+    (b"BM", "image/bmp", "bmp"),
+    (b"II*\x00", "image/tiff", "tiff"),
+    (b"MM\x00*", "image/tiff", "tiff"),
+]
+
+
+def _image_type(file_content):
+    """Returns (content_type, extension) for an image's bytes."""
+    if file_content[:4] == b"RIFF" and file_content[8:12] == b"WEBP":
+        return "image/webp", "webp"
+    for signature, content_type, extension in IMAGE_SIGNATURES:
+        if file_content.startswith(signature):
+            return content_type, extension
+    return "application/octet-stream", "bin"
+
+
 def extract_text_from_image(file_content):
     """
     Extract text from an image by uploading to GCS and querying Firestore.
@@ -33,20 +62,14 @@ def extract_text_from_image(file_content):
     Returns:
         str: Extracted text if found, None otherwise
     """
-    tmp_path = None
     try:
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".jpg") as tmp:
-            tmp.write(file_content)
-            tmp_path = tmp.name
-
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")  # e.g., 20250327_123456
-        base_name = os.path.basename(tmp_path).replace('.jpg', '')  # Remove existing .jpg if present
-        storage_destination = f"images/image_{base_name}_{timestamp}.jpg"
+        content_type, extension = _image_type(file_content)
+        storage_destination = f"images/image_{uuid.uuid4().hex}_{timestamp}.{extension}"
 
-        # Upload to GCS
+        # Upload to GCS straight from memory
         blob = bucket.blob(storage_destination)
-        blob.upload_from_filename(tmp_path)
+        blob.upload_from_string(file_content, content_type=content_type)
         storage_url = f"gs://{bucket.name}/{storage_destination}"
         print(f"Uploaded image to Storage at: {storage_url}")
 
@@ -54,25 +77,23 @@ def extract_text_from_image(file_content):
         collection_ref = db.collection("extractedText")
         query = collection_ref.where(filter=firestore.FieldFilter("file", "==", storage_url))
 
-        # Retry logic to wait for extraction process
-        max_retries = 5
-        retry_delay = 2  # seconds
+        # Retry logic to wait for extraction process. Poll often at first, since
+        # small preprocessed images are usually done within a second or two.
+        retry_delays = [0.5, 0.5, 1, 1, 1, 2, 2]  # seconds
 
-        for attempt in range(max_retries):
-            docs = query.stream()
-            found = False
-            for doc in docs:
+        for attempt in range(len(retry_delays) + 1):
+            for doc in query.limit(1).stream():
                 data = doc.to_dict()
                 extracted_text = data.get("extractedText") or data.get("text")
                 if extracted_text:
                     # print(f"Found text in Firestore on attempt {attempt + 1}: {extracted_text}")
                     return extracted_text
-                found = True
-                break  # Exit inner loop if we found a matching document
 
-            if not found and attempt < max_retries - 1:
-                print(f"Attempt {attempt + 1}: No matching document yet, waiting...")
-                time.sleep(retry_delay)
+            # Wait both when there is no document yet and when the extension
+            # has created it but not filled in the text.
+            if attempt < len(retry_delays):
+                print(f"Attempt {attempt + 1}: No extracted text yet, waiting...")
+                time.sleep(retry_delays[attempt])
 
         print("No extracted text found in Firestore after all retries")
         return None
@@ -87,15 +108,6 @@ def extract_text_from_image(file_content):
         print(f"Unexpected error processing image: {str(e)}")
         return None
 
-    finally:
-        # Clean up temporary file
-        if tmp_path and os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-                print(f"Cleaned up temporary file: {tmp_path}")
-            except Exception as e:
-                print(f"Error removing temporary file {tmp_path}: {str(e)}")
-
 
 def create_user(request):
     # Normalize the email to ensure it's in proper format.
@@ -107,11 +119,14 @@ def create_user(request):
         password=request.password
     )
 
-    db.collection('users').document(user_record.uid).set({
+    user_data = {
         "email": user_record.email,
         "admin": request.admin,
         "createdAt": SERVER_TIMESTAMP,
-    })
+    }
+    if getattr(request, "adminUid", None):
+        user_data["adminUid"] = request.adminUid
+    db.collection('users').document(user_record.uid).set(user_data)
 
     if hasattr(request, "adminUid") and request.adminUid:
         admin_ref = db.collection('users').document(request.adminUid)
@@ -122,12 +137,158 @@ def create_user(request):
     return user_record
 
 
+# auth.import_users accepts at most 1,000 users per call and a Firestore
+# batched write at most 500 operations.
+IMPORT_USERS_BATCH_SIZE = 1000
+FIRESTORE_BATCH_SIZE = 500
+PASSWORD_HASH_ROUNDS = 10000
+MIN_PASSWORD_LENGTH = 6
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _hash_password(password):
+    salt = os.urandom(16)
+    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, PASSWORD_HASH_ROUNDS), salt
+
+
+def _roll_back_accounts(chunk, results, write_error):
+    """
+    Deletes the Auth accounts of rows whose users documents could not be
+    written, so the rows can simply be retried. Accounts that cannot be
+    deleted are reported with their uid and profileMissing so the caller can
+    repair them.
+    """
+    uids = [uid for _, uid, _, _ in chunk]
+    try:
+        not_deleted = {error.index for error in auth.delete_users(uids).errors}
+    except Exception as e:
+        print(f"Error rolling back {len(uids)} accounts: {e}")
+        not_deleted = set(range(len(uids)))
+
+    for i, (index, _, _, _) in enumerate(chunk):
+        if i in not_deleted:
+            results[index].update({"ok": False, "profileMissing": True,
+                                   "error": f"Account created but profile write failed: {write_error}"})
+        else:
+            results[index].pop("uid", None)
+            results[index].update({"ok": False, "error": f"Profile write failed: {write_error}"})
+    print(f"Rolled back {len(uids) - len(not_deleted)}/{len(uids)} accounts")
+
+
+def create_users_bulk(users, admin_uid=None):
+    """
+    Creates many accounts at once using batched Auth imports and Firestore writes.
+
+    Passwords are hashed locally with PBKDF2-SHA256 so they can be sent through
+    auth.import_users, the users documents are written in chunked batches and
+    the new UIDs are appended to the admin's my_students in a single update.
+
+    Args:
+        users (list): Rows with email, password and optional admin flag.
+        admin_uid (str): Admin whose my_students roster receives the new users.
+
+    Returns:
+        dict: results, one per input row in order with ok and uid or error,
+        and rosterError if the accounts were created but could not be added
+        to the admin's roster. If a users document cannot be written, the
+        row's account is deleted again; failing that, the row keeps its uid
+        and is flagged profileMissing.
+
+    Raises:
+        ValueError: If admin_uid is given but the admin does not exist.
+    """
+    if admin_uid and not db.collection('users').document(admin_uid).get().exists:
+        raise ValueError(f"Admin {admin_uid} not found")
+
+    results = [None] * len(users)
+    pending = []
+    seen_emails = set()
+    for index, user in enumerate(users):
+        email = user.email.strip().lower()
+        if not email or "@" not in email:
+            results[index] = {"row": index, "email": email, "ok": False, "error": "Invalid email"}
+        elif len(user.password) < MIN_PASSWORD_LENGTH:
+            results[index] = {"row": index, "email": email, "ok": False,
+                              "error": f"Password must be at least {MIN_PASSWORD_LENGTH} characters"}
+        elif email in seen_emails:
+            results[index] = {"row": index, "email": email, "ok": False, "error": "Duplicate email in request"}
+        else:
+            seen_emails.add(email)
+            pending.append((index, email, user))
+
+    # PBKDF2 releases the GIL, so hashing a school's worth of passwords parallelizes well.
+    with ThreadPoolExecutor() as executor:
+        hashes = list(executor.map(_hash_password, [user.password for _, _, user in pending]))
+
+    hash_alg = auth.UserImportHash.pbkdf2_sha256(rounds=PASSWORD_HASH_ROUNDS)
+    created = []
+    for chunk in _chunks(list(zip(pending, hashes)), IMPORT_USERS_BATCH_SIZE):
+        records = [
+            auth.ImportUserRecord(uid=uuid.uuid4().hex[:28], email=email,
+                                  password_hash=password_hash, password_salt=salt)
+            for (_, email, _), (password_hash, salt) in chunk
+        ]
+        try:
+            import_result = auth.import_users(records, hash_alg=hash_alg)
+            failures = {error.index: error.reason for error in import_result.errors}
+        except Exception as e:
+            print(f"Error importing {len(records)} users: {e}")
+            failures = {i: str(e) for i in range(len(records))}
+
+        for i, (((index, email, user), _), record) in enumerate(zip(chunk, records)):
+            if i in failures:
+                results[index] = {"row": index, "email": email, "ok": False, "error": failures[i]}
+            else:
+                results[index] = {"row": index, "email": email, "ok": True, "uid": record.uid}
+                created.append((index, record.uid, email, user.admin))
+        print(f"Imported {len(records) - len(failures)}/{len(records)} users")
+
+    written = []
+    for chunk in _chunks(created, FIRESTORE_BATCH_SIZE):
+        batch = db.batch()
+        for _, uid, email, is_admin in chunk:
+            user_data = {
+                "email": email,
+                "admin": is_admin,
+                "createdAt": SERVER_TIMESTAMP,
+            }
+            if admin_uid:
+                user_data["adminUid"] = admin_uid
+            batch.set(db.collection('users').document(uid), user_data)
+        try:
+            batch.commit()
+            written.extend(uid for _, uid, _, _ in chunk)
+        except Exception as e:
+            print(f"Error writing {len(chunk)} user documents: {e}")
+            _roll_back_accounts(chunk, results, e)
+
+    roster_error = None
+    if admin_uid and written:
+        try:
+            db.collection('users').document(admin_uid).update({
+                "my_students": ArrayUnion(written)
+            })
+        except Exception as e:
+            print(f"Error adding {len(written)} users to admin {admin_uid}: {e}")
+            roster_error = str(e)
+
+    return {"results": results, "rosterError": roster_error}
+
+
 def delete_user(user_uid):
     try:
         # Delete the user from Firebase Authentication.
         auth.delete_user(user_uid)
-        # Optionally delete the user document from Firestore.
-        db.collection('users').document(user_uid).delete()
+        # Then remove their data the same way a bulk deletion does, so their
+        # progress stops counting towards their class.
+        errors = []
+        _delete_users_data([user_uid], lambda: _bulk_writer(errors))
+        if errors:
+            raise RuntimeError(f"Could not delete {len(errors)} documents: {errors[:MAX_REPORTED_ERRORS]}")
         print(f"User {user_uid} deleted successfully.")
         return True
     except Exception as e:
@@ -135,6 +296,186 @@ def delete_user(user_uid):
         raise
 
 
+# auth.delete_users accepts at most 1,000 UIDs per call and array-contains-any
+# at most 30 comparison values.
+DELETE_USERS_BATCH_SIZE = 1000
+ARRAY_CONTAINS_ANY_LIMIT = 30
+PROGRESS_REPORT_INTERVAL = 100
+MAX_REPORTED_ERRORS = 100
+# Attempts per write before a BulkWriter failure is recorded, the SDK's default.
+BULK_WRITE_MAX_ATTEMPTS = 15
+
+
+def start_user_deletion_job(user_uids):
+    """
+    Records a queued bulk deletion job in the deletionJobs collection.
+
+    Returns:
+        str: The job ID, used to poll its progress.
+    """
+    job_ref = db.collection('deletionJobs').document()
+    job_ref.set({
+        "status": "queued",
+        "total": len(user_uids),
+        "authDeleted": 0,
+        "dataDeleted": 0,
+        "failed": 0,
+        "errors": [],
+        "createdAt": SERVER_TIMESTAMP,
+        "updatedAt": SERVER_TIMESTAMP,
+    })
+    return job_ref.id
+
+
+def get_user_deletion_job(job_id):
+    job_doc = db.collection('deletionJobs').document(job_id).get()
+    if not job_doc.exists:
+        return None
+    return {"jobId": job_id, **job_doc.to_dict()}
+
+
+def _remove_from_arrays(writer, collection, field, user_uids):
+    removed = set(user_uids)
+    for chunk in _chunks(user_uids, ARRAY_CONTAINS_ANY_LIMIT):
+        query = db.collection(collection).where(filter=firestore.FieldFilter(field, "array_contains_any", chunk))
+        for doc in query.stream():
+            # Skip documents this job is deleting anyway, e.g. an admin removed with their students.
+            if collection == 'users' and doc.id in removed:
+                continue
+            writer.update(doc.reference, {field: ArrayRemove(chunk)})
+
+
+def _bulk_writer(errors):
+    """
+    A BulkWriter that records writes still failing after the SDK's default
+    retries in errors. A BulkWriter never raises for failed writes, it only
+    hands them to its on_write_error callback.
+    """
+    def on_write_error(error, bulk_writer):
+        if error.attempts < BULK_WRITE_MAX_ATTEMPTS:
+            return True
+        errors.append({"path": error.operation.reference.path, "error": error.message})
+        return False
+
+    writer = db.bulk_writer()
+    writer.on_write_error(on_write_error)
+    return writer
+
+
+def _subtract_from_class_stats(writer, user_uids):
+    """Removes the users' moduleProgress aggregates from their admin's classStats counters."""
+    user_refs = [db.collection('users').document(uid) for uid in user_uids]
+    admin_uids = {doc.id: doc.to_dict().get('adminUid')
+                  for doc in db.get_all(user_refs, field_paths=['adminUid']) if doc.exists}
+    class_stats = {}
+    for uid in user_uids:
+        admin_uid = admin_uids.get(uid)
+        if not admin_uid or admin_uid == uid:
+            continue
+        module_progress = db.collection('userProgress').document(uid).collection('moduleProgress')
+        for module_progress_doc in module_progress.stream():
+            stats = class_stats.setdefault((module_progress_doc.id, admin_uid), [0, 0, 0, 0])
+            progress, started, completed = _summarize_module_progress(module_progress_doc.to_dict())
+            stats[0] += 1
+            stats[1] += progress
+            stats[2] += started
+            stats[3] += completed
+
+    for (module_id, admin_uid), (students, progress_sum, started, completed) in class_stats.items():
+        writer.set(_class_stats_ref(module_id, admin_uid), {
+            "students": Increment(-students),
+            "progressSum": Increment(-progress_sum),
+            "startedStudents": Increment(-started),
+            "completedStudents": Increment(-completed),
+            "updatedAt": SERVER_TIMESTAMP,
+        }, merge=True)
+
+
+def _delete_users_data(user_uids, new_writer, on_progress=None):
+    """
+    Deletes the Firestore data of users whose Auth accounts are gone: their
+    classStats contributions, userProgress tree and users document, and their
+    UID in my_students rosters and module createdBy arrays.
+
+    Args:
+        user_uids (list): UIDs of the deleted users.
+        new_writer (callable): Returns a fresh BulkWriter.
+        on_progress (callable): Called with the number of users done so far.
+    """
+    writer = new_writer()
+    done = 0
+    for chunk in _chunks(user_uids, PROGRESS_REPORT_INTERVAL):
+        # Read the aggregates before the progress trees they live in are deleted.
+        _subtract_from_class_stats(writer, chunk)
+        for uid in chunk:
+            # recursive_delete closes whatever BulkWriter it is given, so it
+            # gets its own per user and the shared writer is kept for the rest.
+            db.recursive_delete(db.collection('userProgress').document(uid), bulk_writer=new_writer())
+            writer.delete(db.collection('users').document(uid))
+        writer.flush()
+        done += len(chunk)
+        if on_progress:
+            on_progress(done)
+
+    _remove_from_arrays(writer, 'users', 'my_students', user_uids)
+    _remove_from_arrays(writer, 'modules', 'createdBy', user_uids)
+    writer.close()
+
+
+def delete_users_bulk(job_id, user_uids):
+    """
+    Deletes many users and everything that references them, reporting progress
+    on the deletionJobs/{job_id} document.
+
+    Auth accounts are removed with auth.delete_users in batches of 1,000. For
+    every account that was deleted, the userProgress tree is removed with a
+    recursive delete, the users document is deleted, and the UID is pulled out
+    of admin my_students rosters and module createdBy arrays with ArrayRemove.
+    Each user's moduleProgress aggregates are read first and subtracted from
+    their admin's classStats counters. Apart from the recursive deletes, all
+    Firestore writes go through one BulkWriter.
+
+    Writes that still fail after the BulkWriter's retries are added to the
+    job's errors, and the job ends as failed rather than completed.
+
+    Args:
+        job_id (str): Job created by start_user_deletion_job.
+        user_uids (list): UIDs of the users to delete.
+    """
+    job_ref = db.collection('deletionJobs').document(job_id)
+    deleted = []
+    errors = []
+
+    def report(**fields):
+        fields["errors"] = errors[:MAX_REPORTED_ERRORS]
+        fields["updatedAt"] = SERVER_TIMESTAMP
+        job_ref.update(fields)
+
+    try:
+        report(status="running")
+        for chunk in _chunks(user_uids, DELETE_USERS_BATCH_SIZE):
+            result = auth.delete_users(chunk)
+            failures = {error.index: error.reason for error in result.errors}
+            for i, uid in enumerate(chunk):
+                if i in failures:
+                    errors.append({"uid": uid, "error": failures[i]})
+                else:
+                    deleted.append(uid)
+            report(authDeleted=len(deleted), failed=len(errors))
+        print(f"Deleted {len(deleted)}/{len(user_uids)} auth users for job {job_id}")
+
+        _delete_users_data(deleted, lambda: _bulk_writer(errors),
+                           lambda done: report(dataDeleted=done, failed=len(errors)))
+
+        status = "failed" if errors else "completed"
+        report(status=status, dataDeleted=len(deleted), failed=len(errors))
+        print(f"Deletion job {job_id} {status} with {len(errors)} errors")
+    except Exception as e:
+        print(f"Error in deletion job {job_id}: {e}")
+        errors.append({"error": str(e)})
+        report(status="failed", failed=len(errors))
+
+
 def get_admin_students(admin_uid):
     admin_doc = db.collection("users").document(admin_uid).get()
     if not admin_doc.exists:
@@ -153,10 +494,78 @@ def get_admin_students(admin_uid):
     return students
 
 
+# Lesson bodies and module content live outside the module/submodule documents
+# so that list reads stay small. Bodies up to LESSON_INLINE_LIMIT bytes of JSON
+# are stored as native maps in their own document, larger ones (or ones
+# Firestore cannot represent, like nested arrays) as gzipped JSON in Storage.
+LESSON_INLINE_LIMIT = 200 * 1024
+MODULE_LIST_FIELDS = ["name", "description", "image", "progress", "createdBy", "submodules", "createdAt"]
+MIGRATION_BATCH_SIZE = 200
+# Firestore rejects commits over 10 MiB, so migration batches are also flushed
+# by the size of the bodies they carry.
+MIGRATION_BATCH_BYTES = 9 * 1024 * 1024
+
+
+def _has_nested_arrays(value, in_array=False):
+    if isinstance(value, list):
+        return in_array or any(_has_nested_arrays(item, True) for item in value)
+    if isinstance(value, dict):
+        return any(_has_nested_arrays(item) for item in value.values())
+    return False
+
+
+def _parse_legacy_lesson(value):
+    """Turns a lessonData string written as f"{obj}" (or as JSON) back into the object."""
+    if not isinstance(value, str):
+        return value
+    try:
+        return json.loads(value)
+    except ValueError:
+        pass
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+def _store_body(collection, doc_id, gcs_path, body, batch=None):
+    """
+    Stores a lesson or content body and returns where it went.
+
+    Returns:
+        tuple: (storage, path) where storage is "firestore" or "gcs".
+    """
+    encoded = json.dumps(body, separators=(",", ":"), default=str).encode("utf-8")
+    if len(encoded) <= LESSON_INLINE_LIMIT and not _has_nested_arrays(body):
+        doc_ref = db.collection(collection).document(doc_id)
+        if batch is not None:
+            batch.set(doc_ref, body)
+        else:
+            doc_ref.set(body)
+        return "firestore", f"{collection}/{doc_id}"
+
+    blob = bucket.blob(gcs_path)
+    blob.content_encoding = "gzip"
+    blob.upload_from_string(gzip.compress(encoded), content_type="application/json")
+    return "gcs", gcs_path
+
+
+def _load_body(storage_type, path):
+    if storage_type == "gcs":
+        # Stored with Content-Encoding gzip, which Storage decodes on download.
+        return json.loads(bucket.blob(path).download_as_bytes())
+    body_doc = db.document(path).get()
+    return body_doc.to_dict() if body_doc.exists else None
+
+
 def create_module_with_submodules(created_by, module_data, submodules_data):
     """
     Creates a module and its associated submodules in Firestore.
 
+    The module's content and each submodule's lessonData/transcript are split
+    off into their own documents (or Storage objects) so the module and
+    submodule documents only carry metadata.
+
     Args:
         created_by (str): User ID who created the module.
         module_data (dict): Details of the module (name, description, etc.).
@@ -168,12 +577,16 @@ def create_module_with_submodules(created_by, module_data, submodules_data):
     try:
         # Create the module document and get its ID
         module_doc = db.collection('modules').document()
+        module_id = module_doc.id
+        content = module_data.pop('content', None)
+        if content is not None:
+            module_data['contentStorage'], module_data['contentPath'] = _store_body(
+                'moduleContent', module_id, f"moduleContent/{module_id}.json.gz", {"content": content})
         module_data['createdBy'] = [created_by]
         module_data['submodules'] = []  # Placeholder for submodule references
         module_data['createdAt'] = SERVER_TIMESTAMP
 
         module_doc.set(module_data)
-        module_id = module_doc.id
 
         print(f"Module created with ID: {module_id}")
 
@@ -182,6 +595,12 @@ def create_module_with_submodules(created_by, module_data, submodules_data):
         for submodule in submodules_data:
             submodule['moduleId'] = module_id  # Set the parent module ID
             submodule_doc = db.collection('submodules').document()
+            lesson = {
+                "lessonData": submodule.pop('lessonData', None),
+                "transcript": submodule.pop('transcript', None),
+            }
+            submodule['lessonStorage'], submodule['lessonPath'] = _store_body(
+                'lessons', submodule_doc.id, f"lessons/{module_id}/{submodule_doc.id}.json.gz", lesson)
             submodule_doc.set(submodule)
             submodule_ids.append(submodule_doc.id)  # Collect submodule document IDs
 
@@ -197,6 +616,8 @@ def create_module_with_submodules(created_by, module_data, submodules_data):
 
             print(f"Submodule created with ID: {submodule_doc.id}")
 
+        _module_progress_ref(created_by, module_id).set(_empty_module_progress(module_id, len(submodule_ids)))
+
         # Update the module document with submodule document IDs
         module_doc.update({'submodules': submodule_ids})
         print(f"Module updated with submodule references.")
@@ -207,21 +628,149 @@ def create_module_with_submodules(created_by, module_data, submodules_data):
         raise
 
 
+def get_user_modules(user_uid):
+    """
+    Lists the modules a user belongs to, reading only the metadata fields.
+
+    Returns:
+        list: Module metadata dicts, each with its id.
+    """
+    query = db.collection('modules') \
+        .where(filter=firestore.FieldFilter("createdBy", "array_contains", user_uid)) \
+        .select(MODULE_LIST_FIELDS)
+    return [{"id": doc.id, **doc.to_dict()} for doc in query.stream()]
+
+
+def get_module_content(module_id):
+    module_doc = db.collection('modules').document(module_id).get()
+    if not module_doc.exists:
+        return None
+    module_data = module_doc.to_dict()
+    if 'content' in module_data:  # Not migrated yet
+        return module_data['content']
+    if not module_data.get('contentPath'):
+        return None
+    body = _load_body(module_data.get('contentStorage'), module_data['contentPath'])
+    return body.get('content') if body else None
+
+
+def get_submodule_lesson(submodule_id):
+    """
+    Loads a submodule's lesson body on demand.
+
+    Returns:
+        dict: lessonData as a native object plus transcript, or None if the
+        submodule does not exist.
+    """
+    submodule_doc = db.collection('submodules').document(submodule_id).get()
+    if not submodule_doc.exists:
+        return None
+    submodule = submodule_doc.to_dict()
+    if 'lessonData' in submodule:  # Not migrated yet
+        return {
+            "lessonData": _parse_legacy_lesson(submodule['lessonData']),
+            "transcript": submodule.get('transcript'),
+        }
+    if not submodule.get('lessonPath'):
+        return {"lessonData": None, "transcript": None}
+    return _load_body(submodule.get('lessonStorage'), submodule['lessonPath'])
+
+
+def migrate_lesson_storage(dry_run=False):
+    """
+    Moves inline lessonData/transcript and module content written by older
+    versions into the split layout, parsing repr-string lessonData into
+    native objects. Documents already migrated are left alone, so the
+    migration can be re-run safely.
+
+    Args:
+        dry_run (bool): Only count what would be migrated.
+
+    Returns:
+        dict: Number of submodules and modules migrated.
+    """
+    counts = {"submodules": 0, "modules": 0}
+    batch = db.batch()
+    pending = 0
+    pending_bytes = 0
+
+    def make_room(size):
+        nonlocal batch, pending, pending_bytes
+        if pending and (pending >= MIGRATION_BATCH_SIZE or pending_bytes + size > MIGRATION_BATCH_BYTES):
+            batch.commit()
+            print(f"Migrated {counts['submodules']} submodules, {counts['modules']} modules")
+            batch, pending, pending_bytes = db.batch(), 0, 0
+        pending += 1
+        pending_bytes += size
+
+    for submodule_doc in db.collection('submodules').stream():
+        submodule = submodule_doc.to_dict()
+        if 'lessonData' not in submodule and 'transcript' not in submodule:
+            continue
+        counts["submodules"] += 1
+        if dry_run:
+            continue
+        lesson = {
+            "lessonData": _parse_legacy_lesson(submodule.get('lessonData')),
+            "transcript": submodule.get('transcript'),
+        }
+        module_id = submodule.get('moduleId', 'unknown')
+        make_room(len(json.dumps(lesson, separators=(",", ":"), default=str)))
+        lesson_storage, lesson_path = _store_body(
+            'lessons', submodule_doc.id, f"lessons/{module_id}/{submodule_doc.id}.json.gz", lesson, batch=batch)
+        batch.update(submodule_doc.reference, {
+            "lessonStorage": lesson_storage,
+            "lessonPath": lesson_path,
+            "lessonData": DELETE_FIELD,
+            "transcript": DELETE_FIELD,
+        })
+
+    for module_doc in db.collection('modules').stream():
+        module_data = module_doc.to_dict()
+        if 'content' not in module_data:
+            continue
+        counts["modules"] += 1
+        if dry_run:
+            continue
+        content = {"content": module_data['content']}
+        make_room(len(json.dumps(content, separators=(",", ":"), default=str)))
+        content_storage, content_path = _store_body(
+            'moduleContent', module_doc.id, f"moduleContent/{module_doc.id}.json.gz", content, batch=batch)
+        batch.update(module_doc.reference, {
+            "contentStorage": content_storage,
+            "contentPath": content_path,
+            "content": DELETE_FIELD,
+        })
+
+    if pending:
+        batch.commit()
+    print(f"Lesson storage migration {'(dry run) ' if dry_run else ''}complete: {counts}")
+    return counts
+
+
 def add_users_to_module(module_id, user_ids, admin_uid):
     """
     Adds one or more user IDs to the 'createdBy' field of a module.
 
+    The listed users and the admin replace the module's previous members and
+    start it from zero. Members who were dropped lose their moduleProgress
+    aggregate for the module, and its classStats are rebuilt to match.
+
     Args:
         module_id (str): The ID of the module document.
         user_ids (list): A list of user IDs to add to the module.
+        admin_uid (str): The admin adding them, who stays a member.
 
     Returns:
         dict: A dictionary indicating success, the module id, and the added user ids.
     """
     try:
+        module_ref = db.collection("modules").document(module_id)
+        previous_doc = module_ref.get()
+        previous_members = (previous_doc.to_dict().get("createdBy") or []) if previous_doc.exists else []
+
         user_ids.append(admin_uid)
 
-        module_ref = db.collection("modules").document(module_id)
         # Add the new user IDs to the createdBy array
         module_ref.update({
             "createdBy": user_ids
@@ -230,10 +779,7 @@ def add_users_to_module(module_id, user_ids, admin_uid):
 
         user_ids.remove(admin_uid)
 
-        # Retrieve the updated module document to get its submodules
-        module_doc = module_ref.get()
-        module_data = module_doc.to_dict()
-        submodule_ids = module_data.get("submodules", [])
+        submodule_ids = previous_doc.to_dict().get("submodules", [])
 
         # Define the default progress data for each submodule
         progress_data = {
@@ -251,7 +797,309 @@ def add_users_to_module(module_id, user_ids, admin_uid):
                 progress_ref.set(progress_data)
                 print(f"Created progress doc for user {user_id} for submodule {submodule_id}")
 
+        # Students keep the class they already belong to; adminUid is only
+        # filled in for existing users that have none yet.
+        user_refs = [db.collection("users").document(user_id) for user_id in user_ids]
+        admin_uids = {doc.id: doc.to_dict().get("adminUid")
+                      for doc in db.get_all(user_refs, field_paths=["adminUid"]) if doc.exists}
+        unassigned = {uid for uid, assigned in admin_uids.items() if not assigned}
+
+        # Every listed user starts the module from zero, so the aggregates can be
+        # written outright. createdBy was replaced above, so they are the whole class.
+        for chunk in _chunks(user_ids, FIRESTORE_BATCH_SIZE // 2):
+            batch = db.batch()
+            for user_id in chunk:
+                batch.set(_module_progress_ref(user_id, module_id),
+                          _empty_module_progress(module_id, len(submodule_ids)))
+                if user_id in unassigned:
+                    batch.update(db.collection("users").document(user_id), {"adminUid": admin_uid})
+            batch.commit()
+
+        # Users dropped from createdBy lose their aggregate, so it no longer
+        # counts towards a class or gets subtracted again when they are deleted.
+        members = set(user_ids) | {admin_uid}
+        dropped = [uid for uid in previous_members if uid not in members]
+        for chunk in _chunks(dropped, FIRESTORE_BATCH_SIZE):
+            batch = db.batch()
+            for user_id in chunk:
+                batch.delete(_module_progress_ref(user_id, module_id))
+            batch.commit()
+
+        # With every member at zero, each class's stats are just its head count.
+        class_stats = {admin_uid: _empty_class_stats(module_id, admin_uid, len(submodule_ids))}
+        for user_id in dict.fromkeys(user_ids):
+            student_admin = admin_uid if user_id in unassigned else admin_uids.get(user_id)
+            if not student_admin or student_admin == user_id:
+                continue
+            class_stats.setdefault(student_admin,
+                                   _empty_class_stats(module_id, student_admin, len(submodule_ids)))
+            class_stats[student_admin]["students"] += 1
+        stats_collection = module_ref.collection("classStats")
+        batch = db.batch()
+        for stats_doc in stats_collection.stream():
+            if stats_doc.id not in class_stats:
+                batch.delete(stats_doc.reference)
+        for stats_admin, stats in class_stats.items():
+            batch.set(stats_collection.document(stats_admin), stats)
+        batch.commit()
+
         return {"success": True, "moduleId": module_id, "addedUsers": user_ids}
     except Exception as e:
         print(f"Error adding users to module {module_id}: {e}")
         raise e
+
+
+# Progress aggregates. Alongside the per-submodule progress documents we keep
+#   userProgress/{uid}/moduleProgress/{moduleId}     one user's progress in a module
+#   modules/{moduleId}/classStats/{adminUid}         a class's progress in a module
+# so dashboards read one document per module instead of every progress document.
+# A student counts towards a class once they have a moduleProgress document and
+# their users document has that adminUid. Only members in the module's
+# createdBy keep a moduleProgress document.
+COMPLETED_PERCENTAGE = 100
+
+
+def _module_progress_ref(user_uid, module_id):
+    return db.collection('userProgress').document(user_uid).collection('moduleProgress').document(module_id)
+
+
+def _class_stats_ref(module_id, admin_uid):
+    return db.collection('modules').document(module_id).collection('classStats').document(admin_uid)
+
+
+def _empty_module_progress(module_id, submodule_count):
+    return {
+        "moduleId": module_id,
+        "submoduleCount": submodule_count,
+        "completedSubmodules": 0,
+        "percentageSum": 0,
+        "progress": 0,
+        "progressStatus": "Not Started",
+        "lastUpdated": datetime.now().isoformat(),
+    }
+
+
+def _empty_class_stats(module_id, admin_uid, submodule_count, students=0):
+    return {
+        "moduleId": module_id,
+        "adminUid": admin_uid,
+        "submoduleCount": submodule_count,
+        "students": students,
+        "startedStudents": 0,
+        "completedStudents": 0,
+        "progressSum": 0,
+        "updatedAt": SERVER_TIMESTAMP,
+    }
+
+
+def _progress_status(percentage):
+    if percentage >= COMPLETED_PERCENTAGE:
+        return "Completed"
+    return "In Progress" if percentage > 0 else "Not Started"
+
+
+def _summarize_module_progress(aggregate):
+    """Returns (progress, started, completed) for one user's module aggregate."""
+    count = aggregate.get("submoduleCount") or 0
+    progress = aggregate.get("percentageSum", 0) / count if count else 0
+    completed = count > 0 and aggregate.get("completedSubmodules", 0) >= count
+    return progress, progress > 0 and not completed, completed
+
+
+def _module_progress_from_docs(module_id, submodule_count, progress_docs):
+    aggregate = _empty_module_progress(module_id, submodule_count)
+    for progress in progress_docs:
+        percentage = progress.get("completionPercentage") or 0
+        aggregate["percentageSum"] += percentage
+        aggregate["completedSubmodules"] += percentage >= COMPLETED_PERCENTAGE
+    aggregate["progress"] = _summarize_module_progress(aggregate)[0]
+    aggregate["progressStatus"] = _progress_status(aggregate["progress"])
+    return aggregate
+
+
+@firestore.transactional
+def _update_progress_in_transaction(transaction, user_uid, submodule_id, completion_percentage, progress_status):
+    progress_ref = db.collection('userProgress').document(user_uid) \
+        .collection('submoduleProgress').document(submodule_id)
+    submodule_doc = db.collection('submodules').document(submodule_id).get(transaction=transaction)
+    if not submodule_doc.exists:
+        raise ValueError(f"Submodule {submodule_id} not found")
+    module_id = submodule_doc.to_dict().get('moduleId')
+    module_progress_ref = _module_progress_ref(user_uid, module_id)
+
+    progress_doc = progress_ref.get(transaction=transaction)
+    module_progress_doc = module_progress_ref.get(transaction=transaction)
+    user_doc = db.collection('users').document(user_uid).get(transaction=transaction)
+
+    if module_progress_doc.exists:
+        aggregate = module_progress_doc.to_dict()
+    else:
+        module_doc = db.collection('modules').document(module_id).get(transaction=transaction)
+        submodule_count = len(module_doc.to_dict().get('submodules') or []) if module_doc.exists else 0
+        aggregate = _empty_module_progress(module_id, submodule_count)
+    before = _summarize_module_progress(aggregate)
+
+    old_percentage = (progress_doc.to_dict().get('completionPercentage') if progress_doc.exists else 0) or 0
+    aggregate["percentageSum"] += completion_percentage - old_percentage
+    aggregate["completedSubmodules"] += (completion_percentage >= COMPLETED_PERCENTAGE) - \
+                                        (old_percentage >= COMPLETED_PERCENTAGE)
+    after = _summarize_module_progress(aggregate)
+    aggregate["progress"] = after[0]
+    aggregate["progressStatus"] = _progress_status(after[0])
+    aggregate["lastUpdated"] = datetime.now().isoformat()
+
+    transaction.set(progress_ref, {
+        "completionPercentage": completion_percentage,
+        "progressStatus": progress_status or _progress_status(completion_percentage),
+        "completionDate": datetime.now().isoformat() if completion_percentage >= COMPLETED_PERCENTAGE else None,
+        "lastUpdated": datetime.now().isoformat(),
+    }, merge=True)
+    transaction.set(module_progress_ref, aggregate)
+
+    admin_uid = user_doc.to_dict().get('adminUid') if user_doc.exists else None
+    if admin_uid and admin_uid != user_uid:
+        transaction.set(_class_stats_ref(module_id, admin_uid), {
+            "moduleId": module_id,
+            "adminUid": admin_uid,
+            "submoduleCount": aggregate["submoduleCount"],
+            "students": Increment(0 if module_progress_doc.exists else 1),
+            "progressSum": Increment(after[0] - before[0]),
+            "startedStudents": Increment(int(after[1]) - int(before[1])),
+            "completedStudents": Increment(int(after[2]) - int(before[2])),
+            "updatedAt": SERVER_TIMESTAMP,
+        }, merge=True)
+    return aggregate
+
+
+def update_submodule_progress(user_uid, submodule_id, completion_percentage, progress_status=None):
+    """
+    Records a user's progress on a submodule and updates their module
+    aggregate and their class's counters in the same transaction.
+
+    Args:
+        user_uid (str): The user whose progress changed.
+        submodule_id (str): The submodule they progressed on.
+        completion_percentage (float): New completion percentage, 0-100.
+        progress_status (str): Optional status; derived from the percentage if omitted.
+
+    Returns:
+        dict: The user's updated progress aggregate for the module.
+    """
+    completion_percentage = min(max(completion_percentage, 0), COMPLETED_PERCENTAGE)
+    return _update_progress_in_transaction(db.transaction(), user_uid, submodule_id,
+                                           completion_percentage, progress_status)
+
+
+def get_class_progress(admin_uid):
+    """
+    Returns completion stats for every module an admin's class is in, using
+    one query plus one read per module.
+
+    Returns:
+        list: Per-module stats with averageProgress and completionRate.
+    """
+    modules = list(db.collection('modules')
+                   .where(filter=firestore.FieldFilter("createdBy", "array_contains", admin_uid))
+                   .select(["name", "submodules"])
+                   .stream())
+    if not modules:
+        return []
+    stats_refs = [_class_stats_ref(module_doc.id, admin_uid) for module_doc in modules]
+    stats_docs = {doc.reference.path: doc.to_dict() for doc in db.get_all(stats_refs) if doc.exists}
+
+    class_progress = []
+    for module_doc, stats_ref in zip(modules, stats_refs):
+        module_data = module_doc.to_dict()
+        stats = stats_docs.get(stats_ref.path) or _empty_class_stats(
+            module_doc.id, admin_uid, len(module_data.get('submodules') or []))
+        students = stats.get("students", 0)
+        class_progress.append({
+            "moduleId": module_doc.id,
+            "name": module_data.get('name'),
+            "students": students,
+            "startedStudents": stats.get("startedStudents", 0),
+            "completedStudents": stats.get("completedStudents", 0),
+            "averageProgress": stats.get("progressSum", 0) / students if students else 0,
+            "completionRate": stats.get("completedStudents", 0) / students if students else 0,
+        })
+    return class_progress
+
+
+def backfill_progress_aggregates(dry_run=False):
+    """
+    Rebuilds every moduleProgress and classStats document from the
+    per-submodule progress documents, and fills in users.adminUid from the
+    admins' my_students rosters where it is missing. Aggregates of users who
+    are no longer in a module's createdBy, and stats of classes with no
+    members left, are deleted. Safe to re-run.
+
+    Args:
+        dry_run (bool): Compute the aggregates without writing them.
+
+    Returns:
+        dict: Number of module aggregates and class stats written, and of
+        stale ones removed.
+    """
+    student_admins = {}
+    for admin_doc in db.collection('users').where(filter=firestore.FieldFilter("admin", "==", True)).stream():
+        for student_uid in admin_doc.to_dict().get('my_students') or []:
+            student_admins.setdefault(student_uid, admin_doc.id)
+    missing_admin_uid = []
+    for user_doc in db.collection('users').select(["adminUid"]).stream():
+        if user_doc.to_dict().get('adminUid'):
+            student_admins[user_doc.id] = user_doc.to_dict()['adminUid']
+        elif user_doc.id in student_admins:
+            missing_admin_uid.append(user_doc.id)
+
+    counts = {"moduleProgress": 0, "classStats": 0, "removed": 0}
+    rebuilt = set()
+    writer = None if dry_run else db.bulk_writer()
+    for module_doc in db.collection('modules').select(["createdBy", "submodules"]).stream():
+        module_data = module_doc.to_dict()
+        submodule_ids = module_data.get('submodules') or []
+        class_stats = {}
+        for user_uid in dict.fromkeys(module_data.get('createdBy') or []):
+            progress_refs = [db.collection('userProgress').document(user_uid)
+                             .collection('submoduleProgress').document(submodule_id)
+                             for submodule_id in submodule_ids]
+            progress_docs = [doc.to_dict() for doc in db.get_all(progress_refs) if doc.exists] \
+                if progress_refs else []
+            aggregate = _module_progress_from_docs(module_doc.id, len(submodule_ids), progress_docs)
+            counts["moduleProgress"] += 1
+            module_progress_ref = _module_progress_ref(user_uid, module_doc.id)
+            rebuilt.add(module_progress_ref.path)
+            if writer:
+                writer.set(module_progress_ref, aggregate)
+
+            admin_uid = student_admins.get(user_uid)
+            if not admin_uid or admin_uid == user_uid:
+                continue
+            stats = class_stats.setdefault(admin_uid,
+                                           _empty_class_stats(module_doc.id, admin_uid, len(submodule_ids)))
+            progress, started, completed = _summarize_module_progress(aggregate)
+            stats["students"] += 1
+            stats["progressSum"] += progress
+            stats["startedStudents"] += started
+            stats["completedStudents"] += completed
+
+        for admin_uid, stats in class_stats.items():
+            counts["classStats"] += 1
+            class_stats_ref = _class_stats_ref(module_doc.id, admin_uid)
+            rebuilt.add(class_stats_ref.path)
+            if writer:
+                writer.set(class_stats_ref, stats)
+
+    for collection_id in ('moduleProgress', 'classStats'):
+        for stale_doc in db.collection_group(collection_id).select([]).stream():
+            if stale_doc.reference.path in rebuilt:
+                continue
+            counts["removed"] += 1
+            if writer:
+                writer.delete(stale_doc.reference)
+
+    if writer:
+        for student_uid in missing_admin_uid:
+            writer.update(db.collection('users').document(student_uid), {"adminUid": student_admins[student_uid]})
+        writer.close()
+    print(f"Progress aggregate backfill {'(dry run) ' if dry_run else ''}complete: {counts}")
+    return counts
@@ -0,0 +1,22 @@
+"""
+Moves existing submodule lessonData/transcript and module content into the
+split storage layout. Run from the repository root:
+
+    python -m app.firebaseHandling.migrate_lesson_storage --dry-run
+    python -m app.firebaseHandling.migrate_lesson_storage
+"""
+
+import argparse
+
+from .firebaseHandling import migrate_lesson_storage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate lesson bodies out of module and submodule documents.")
+    parser.add_argument("--dry-run", action="store_true", help="Only count the documents that would be migrated")
+    args = parser.parse_args()
+    migrate_lesson_storage(dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# image_preprocessing.py
+
+import asyncio
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Longest side, in pixels, that images are scaled down to before OCR. Phone
+# photos of a page are usually 3000-4000px; text stays legible well below that.
+OCR_MAX_SIDE = 2000
+OCR_JPEG_QUALITY = 85
+EXIF_ORIENTATION = 0x0112
+
+# Pillow releases the GIL while decoding, resizing and encoding, so a thread
+# pool processes several images in parallel without blocking the event loop.
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="image-preprocess")
+
+
+def preprocess_image(file_content, max_side=OCR_MAX_SIDE):
+    """
+    Prepare a photo for OCR: decode, apply the EXIF orientation, flatten any
+    transparency onto white, scale down so the longest side is at most
+    max_side, convert to grayscale and re-encode as JPEG.
+
+    Args:
+        file_content (bytes): Binary content of a JPEG or PNG image
+
+    Returns:
+        bytes: The re-encoded JPEG, or the original bytes if the image could
+        not be decoded, or if it needed no rotation or flattening and
+        re-encoding would not make it smaller
+    """
+    try:
+        with Image.open(io.BytesIO(file_content)) as image:
+            # For JPEGs, let the decoder downscale by a power of two while decoding.
+            image.draft("L", (max_side, max_side))
+            rotated = image.getexif().get(EXIF_ORIENTATION, 1) != 1
+            image = ImageOps.exif_transpose(image)
+            flattened = "A" in image.getbands() or "transparency" in image.info
+            if flattened:
+                # Flatten onto white; dropping alpha would turn transparent
+                # pixels black and hide dark text on them.
+                image = Image.alpha_composite(Image.new("RGBA", image.size, "white"), image.convert("RGBA"))
+            image = image.convert("L")
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=OCR_JPEG_QUALITY, optimize=True)
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError) as e:
+        print(f"Could not preprocess image, uploading it unchanged: {str(e)}")
+        return file_content
+
+    processed = output.getvalue()
+    print(f"Preprocessed image from {len(file_content)} to {len(processed)} bytes")
+    # A rotated or flattened image reads better even when it is not smaller.
+    if rotated or flattened or len(processed) < len(file_content):
+        return processed
+    return file_content
+
+
+async def preprocess_images(contents):
+    """
+    Preprocess several images concurrently in the worker pool.
+
+    Args:
+        contents (list): Binary contents of the images
+
+    Returns:
+        list: Preprocessed image bytes, in the same order
+    """
+    loop = asyncio.get_running_loop()
+    return await asyncio.gather(*(loop.run_in_executor(_executor, preprocess_image, content)
+                                  for content in contents))
@@ -0,0 +1,76 @@
+"""
+Run the offline load scenarios and print a latency/throughput report.
+
+    python -m benchmarks --profile local --requests 200 --concurrency 16
+    python -m benchmarks -s admin-students --latency firestore=lognormal:10,0.5 --json bench.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+
+from .harness import PROFILES, Harness, run_load
+from .scenarios import SCENARIOS
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-s", "--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="Scenario to run (repeatable, default: all)")
+    parser.add_argument("--profile", default="local", choices=sorted(PROFILES),
+                        help="Latency profile for the fake backends")
+    parser.add_argument("--latency", action="append", default=[], metavar="SERVICE=SPEC",
+                        help="Override one service, e.g. firestore=uniform:2,10")
+    parser.add_argument("-n", "--requests", type=int, default=100)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--real-model", action="store_true",
+                        help="Use the Keras classifier instead of the fake predictor")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show the routes' own print output")
+    return parser.parse_args(argv)
+
+
+def format_report(results):
+    header = f"{'scenario':<24}{'reqs':>6}{'errs':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    lines = [header, "-" * len(header)]
+    for r in results:
+        lines.append(f"{r['scenario']:<24}{r['requests']:>6}{r['errors']:>6}{r['rps']:>10.1f}"
+                     f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+        if r["items_per_s"] != r["rps"]:
+            lines.append(f"    throughput: {r['items_per_s']:.1f} items/s")
+        ops = ", ".join(f"{op}={count:g}" for op, count in r["ops_per_request"].items())
+        lines.append(f"    per request: {ops or 'no backend calls'}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    latencies = dict(PROFILES[args.profile])
+    for override in args.latency:
+        service, _, spec = override.partition("=")
+        if service not in latencies:
+            raise SystemExit(f"Unknown service {service!r}; expected one of {sorted(latencies)}")
+        latencies[service] = spec
+
+    harness = Harness(latencies, use_real_model=args.real_model).install()
+    results = []
+    for name in args.scenario or list(SCENARIOS):
+        print(f"Running {name} ({args.requests} requests, concurrency {args.concurrency})...")
+        route_output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+        with route_output:
+            results.append(asyncio.run(run_load(harness, SCENARIOS[name](), args.requests,
+                                                args.concurrency, args.warmup)))
+
+    print(f"\nProfile: {args.profile} ({', '.join(f'{k}={v}' for k, v in sorted(latencies.items()))})")
+    print(format_report(results))
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump({"profile": args.profile, "latencies": latencies, "results": results}, handle, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
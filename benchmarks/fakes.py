@@ -0,0 +1,943 @@
+"""
+In-memory stand-ins for Firestore, Cloud Storage, Firebase Auth and OpenAI.
+
+Every fake sleeps for a latency sampled from a configurable distribution on
+each simulated RPC, and counts the calls it served, so the benchmark scenarios
+can report both latency and how many backend round trips a route costs.
+"""
+
+import asyncio
+import copy
+import gzip
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+
+class Latency:
+    """
+    A latency distribution, sampled once per simulated round trip.
+
+    Specs are parsed from strings of the form ``kind:arg1,arg2`` (milliseconds):
+    ``constant:5``, ``uniform:2,10`` or ``lognormal:8,0.5`` (median, sigma).
+    """
+
+    def __init__(self, kind="constant", params=(0.0,), seed=None):
+        if kind not in ("constant", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {kind}")
+        self.kind = kind
+        self.params = tuple(float(p) for p in params)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def parse(cls, spec, seed=None):
+        kind, _, args = spec.partition(":")
+        params = [p for p in args.split(",") if p] or [0.0]
+        return cls(kind.strip(), params, seed=seed)
+
+    def sample(self):
+        """Return one latency sample in seconds."""
+        with self._lock:
+            if self.kind == "constant":
+                ms = self.params[0]
+            elif self.kind == "uniform":
+                ms = self._rng.uniform(self.params[0], self.params[1])
+            else:
+                median, sigma = self.params[0], self.params[1]
+                ms = self._rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+        return max(ms, 0.0) / 1000.0
+
+    def sleep(self):
+        delay = self.sample()
+        if delay:
+            time.sleep(delay)
+
+    async def asleep(self):
+        delay = self.sample()
+        if delay:
+            await asyncio.sleep(delay)
+
+    def __repr__(self):
+        return f"{self.kind}:{','.join(f'{p:g}' for p in self.params)}"
+
+
+# ---------------------------------------------------------------------------
+# google.cloud.firestore_v1 sentinels
+# ---------------------------------------------------------------------------
+
+class _Sentinel:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+SERVER_TIMESTAMP = _Sentinel("SERVER_TIMESTAMP")
+DELETE_FIELD = _Sentinel("DELETE_FIELD")
+
+
+class ArrayUnion:
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class ArrayRemove:
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class Increment:
+    def __init__(self, value):
+        self.value = value
+
+
+class FieldFilter:
+    def __init__(self, field_path, op_string, value):
+        self.field_path = field_path
+        self.op_string = op_string
+        self.value = value
+
+
+def _resolve(value, current):
+    if value is SERVER_TIMESTAMP:
+        return datetime.now(timezone.utc)
+    if isinstance(value, ArrayUnion):
+        merged = list(current) if isinstance(current, list) else []
+        merged.extend(v for v in value.values if v not in merged)
+        return merged
+    if isinstance(value, ArrayRemove):
+        current = current if isinstance(current, list) else []
+        return [v for v in current if v not in value.values]
+    if isinstance(value, Increment):
+        return (current if isinstance(current, (int, float)) else 0) + value.value
+    if isinstance(value, dict):
+        base = current if isinstance(current, dict) else {}
+        return {k: _resolve(v, base.get(k)) for k, v in value.items()}
+    return copy.deepcopy(value)
+
+
+def _merge(target, data):
+    for key, value in data.items():
+        if value is DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = _resolve(value, target.get(key))
+
+
+def _update(target, data):
+    for path, value in data.items():
+        parts = path.split(".")
+        node = target
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+        if value is DELETE_FIELD:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = _resolve(value, node.get(parts[-1]))
+
+
+def _has_nested_arrays(value, in_array=False):
+    if isinstance(value, list):
+        return in_array or any(_has_nested_arrays(item, True) for item in value)
+    if isinstance(value, dict):
+        return any(_has_nested_arrays(item) for item in value.values())
+    return False
+
+
+def _lookup(data, field_path):
+    node = data
+    for part in field_path.split("."):
+        if not isinstance(node, dict) or part not in node:
+            return None
+        node = node[part]
+    return node
+
+
+_OPERATORS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a is not None and a < b,
+    "<=": lambda a, b: a is not None and a <= b,
+    ">": lambda a, b: a is not None and a > b,
+    ">=": lambda a, b: a is not None and a >= b,
+    "in": lambda a, b: a in b,
+    "not-in": lambda a, b: a not in b,
+    "array_contains": lambda a, b: isinstance(a, list) and b in a,
+    "array_contains_any": lambda a, b: isinstance(a, list) and any(v in a for v in b),
+}
+
+# Firestore caps the number of comparison values in these operators.
+_DISJUNCTION_LIMIT = 30
+
+
+# ---------------------------------------------------------------------------
+# Firestore
+# ---------------------------------------------------------------------------
+
+class NotFound(Exception):
+    """Raised by ``update`` on a missing document, like google.api_core's NotFound."""
+
+
+class Aborted(Exception):
+    """Raised when a transaction's reads were invalidated by a concurrent write."""
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path):
+        return _lookup(self._data or {}, field_path)
+
+
+class FakeDocumentReference:
+    def __init__(self, client, path):
+        self._client = client
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    @property
+    def parent(self):
+        return FakeCollectionReference(self._client, self.path.rsplit("/", 1)[0])
+
+    def collection(self, name):
+        return FakeCollectionReference(self._client, f"{self.path}/{name}")
+
+    def collections(self):
+        self._client._rpc("list_collections")
+        return [self.collection(name) for name in self._client._subcollections(self.path)]
+
+    def get(self, transaction=None):
+        self._client._rpc("get")
+        self._client.ops["reads"] += 1
+        data = self._client._read(self.path, transaction)
+        self._client._count_bytes(data)
+        return FakeSnapshot(self, data)
+
+    def set(self, data, merge=False):
+        self._client._rpc("set")
+        self._client._write_set(self.path, data, merge)
+
+    def update(self, data):
+        self._client._rpc("update")
+        self._client._write_update(self.path, data)
+
+    def delete(self):
+        self._client._rpc("delete")
+        self._client._write_delete(self.path)
+
+
+class FakeQuery:
+    """A query over one collection, or over every collection with that id if ``all_descendants``."""
+
+    def __init__(self, client, path, filters=(), limit=None, order=None, fields=None, all_descendants=False):
+        self._client = client
+        self._path = path
+        self._filters = list(filters)
+        self._limit = limit
+        self._order = order
+        self._fields = fields
+        self._all_descendants = all_descendants
+
+    def _copy(self, **changes):
+        state = {"filters": self._filters, "limit": self._limit, "order": self._order, "fields": self._fields,
+                 "all_descendants": self._all_descendants}
+        state.update(changes)
+        return FakeQuery(self._client, self._path, **state)
+
+    def where(self, field_path=None, op_string=None, value=None, *, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string in ("in", "not-in", "array_contains_any") and len(value) > _DISJUNCTION_LIMIT:
+            raise ValueError(f"'{op_string}' supports up to {_DISJUNCTION_LIMIT} comparison values")
+        return self._copy(filters=self._filters + [(field_path, op_string, value)])
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(order=(field_path, direction))
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def select(self, field_paths):
+        return self._copy(fields=list(field_paths))
+
+    def _matches(self):
+        matches = []
+        if self._all_descendants:
+            documents = self._client._group_documents(self._path)
+        else:
+            documents = [(f"{self._path}/{doc_id}", data) for doc_id, data in self._client._documents(self._path)]
+        for path, data in documents:
+            if all(_OPERATORS[op](_lookup(data, field), value) for field, op, value in self._filters):
+                matches.append((path, data))
+        if self._order:
+            field, direction = self._order
+            matches.sort(key=lambda item: (_lookup(item[1], field) is None, _lookup(item[1], field)),
+                         reverse=str(direction).upper().startswith("DESC"))
+        if self._limit is not None:
+            matches = matches[:self._limit]
+        if self._fields is not None:
+            matches = [(path, {field: data[field] for field in self._fields if field in data})
+                       for path, data in matches]
+        return matches
+
+    def stream(self, transaction=None):
+        self._client._rpc("query")
+        matches = self._matches()
+        self._client.ops["reads"] += max(len(matches), 1)
+        for path, data in matches:
+            self._client._count_bytes(data)
+            yield FakeSnapshot(FakeDocumentReference(self._client, path), data)
+
+    def get(self, transaction=None):
+        return list(self.stream())
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client, path):
+        super().__init__(client, path)
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, document_id=None):
+        return FakeDocumentReference(self._client, f"{self._path}/{document_id or uuid.uuid4().hex[:20]}")
+
+    def add(self, data):
+        ref = self.document()
+        ref.set(data)
+        return SERVER_TIMESTAMP, ref
+
+    def list_documents(self):
+        self._client._rpc("list_documents")
+        return [self.document(doc_id) for doc_id, _ in self._client._documents(self._path)]
+
+
+class FakeWriteBatch:
+    """Queues writes and applies them on ``commit`` as a single round trip."""
+
+    MAX_WRITES = 500
+
+    def __init__(self, client):
+        self._client = client
+        self._writes = []
+
+    def set(self, reference, data, merge=False):
+        self._writes.append(("set", reference.path, data, merge))
+
+    def update(self, reference, data):
+        self._writes.append(("update", reference.path, data, None))
+
+    def delete(self, reference):
+        self._writes.append(("delete", reference.path, None, None))
+
+    def __len__(self):
+        return len(self._writes)
+
+    def _apply_write(self, kind, path, data, merge):
+        if kind == "set":
+            self._client._write_set(path, data, merge)
+        elif kind == "update":
+            self._client._write_update(path, data)
+        else:
+            self._client._write_delete(path)
+
+    def _apply(self):
+        for write in self._writes:
+            self._apply_write(*write)
+        results, self._writes = self._writes, []
+        return results
+
+    def commit(self):
+        if len(self._writes) > self.MAX_WRITES:
+            raise ValueError(f"A batch can contain at most {self.MAX_WRITES} writes")
+        self._client._rpc("commit")
+        return self._apply()
+
+
+class FakeTransaction(FakeWriteBatch):
+    """
+    Optimistic transaction: reads record the version of each document and
+    the commit aborts if any of them changed in the meantime.
+    """
+
+    def __init__(self, client):
+        super().__init__(client)
+        self._read_versions = {}
+
+    def _commit(self):
+        self._client._rpc("commit")
+        with self._client._lock:
+            for path, version in self._read_versions.items():
+                if self._client._versions.get(path, 0) != version:
+                    self._writes = []
+                    self._read_versions = {}
+                    raise Aborted(f"Transaction contention on {path}")
+            self._read_versions = {}
+            return self._apply()
+
+
+def transactional(to_wrap, max_attempts=5):
+    """Stands in for ``firestore.transactional``, retrying on contention."""
+
+    def wrapper(transaction, *args, **kwargs):
+        for attempt in range(max_attempts):
+            try:
+                result = to_wrap(transaction, *args, **kwargs)
+                transaction._commit()
+                return result
+            except Aborted:
+                transaction._client.ops["transaction_retries"] += 1
+                if attempt == max_attempts - 1:
+                    raise
+    return wrapper
+
+
+class BulkWriterOperation:
+    def __init__(self, reference):
+        self.reference = reference
+
+
+class BulkWriteFailure:
+    def __init__(self, operation, code, message, attempts):
+        self.operation = operation
+        self.code = code
+        self.message = message
+        self.attempts = attempts
+
+
+class FakeBulkWriter:
+    """
+    Buffers writes and sends them in batches of ``BATCH_SIZE``, the way the
+    real BulkWriter does, so one round trip covers up to 20 writes.
+
+    As with the real one, writes succeed or fail individually and failures
+    never raise: each is passed to the ``on_write_error`` callback, which
+    returns whether to retry. The default retries up to ``MAX_ATTEMPTS``
+    times and then drops the write.
+    """
+
+    BATCH_SIZE = 20
+    MAX_ATTEMPTS = 15
+
+    def __init__(self, client):
+        self._client = client
+        self._batch = FakeWriteBatch(client)
+        self._closed = False
+        self._on_write_error = lambda error, bulk_writer: error.attempts < self.MAX_ATTEMPTS
+
+    def on_write_error(self, callback):
+        self._on_write_error = callback
+
+    def _enqueue(self):
+        if self._closed:
+            raise Exception("BulkWriter is closed and cannot accept new operations")
+        if len(self._batch) >= self.BATCH_SIZE:
+            self.flush()
+
+    def set(self, reference, data, merge=False):
+        self._enqueue()
+        self._batch.set(reference, data, merge)
+
+    def update(self, reference, data):
+        self._enqueue()
+        self._batch.update(reference, data)
+
+    def delete(self, reference):
+        self._enqueue()
+        self._batch.delete(reference)
+
+    def flush(self):
+        if not len(self._batch):
+            return
+        self._client._rpc("commit")
+        writes, self._batch._writes = self._batch._writes, []
+        for write in writes:
+            attempts = 0
+            while True:
+                attempts += 1
+                try:
+                    self._batch._apply_write(*write)
+                    break
+                except Exception as e:
+                    failure = BulkWriteFailure(BulkWriterOperation(FakeDocumentReference(self._client, write[1])),
+                                               type(e).__name__, str(e), attempts)
+                    if not self._on_write_error(failure, self):
+                        break
+
+    def close(self):
+        self.flush()
+        self._closed = True
+
+
+class FakeFirestore:
+    """
+    A thread-safe, in-memory Firestore client.
+
+    ``ops`` counts round trips per RPC kind plus the number of document
+    ``reads`` and ``writes`` billed, which is what the scenarios report.
+    """
+
+    def __init__(self, latency=None):
+        self.latency = latency or Latency()
+        self.ops = Counter()
+        self._store = {}
+        self._versions = {}
+        self._lock = threading.RLock()
+
+    def _rpc(self, kind):
+        self.ops[kind] += 1
+        self.latency.sleep()
+
+    def _count_bytes(self, data):
+        if data is not None:
+            self.ops["read_bytes"] += len(json.dumps(data, default=str))
+
+    def _read(self, path, transaction=None):
+        with self._lock:
+            if transaction is not None:
+                transaction._read_versions[path] = self._versions.get(path, 0)
+            data = self._store.get(path)
+            return copy.deepcopy(data) if data is not None else None
+
+    def _documents(self, collection_path):
+        prefix = collection_path + "/"
+        with self._lock:
+            return [(path[len(prefix):], copy.deepcopy(data)) for path, data in sorted(self._store.items())
+                    if path.startswith(prefix) and "/" not in path[len(prefix):]]
+
+    def _group_documents(self, collection_id):
+        with self._lock:
+            return [(path, copy.deepcopy(data)) for path, data in sorted(self._store.items())
+                    if path.split("/")[-2] == collection_id]
+
+    def _subcollections(self, document_path):
+        prefix = document_path + "/"
+        with self._lock:
+            return sorted({path[len(prefix):].split("/", 1)[0] for path in self._store if path.startswith(prefix)})
+
+    def _write_set(self, path, data, merge):
+        if _has_nested_arrays(data):
+            raise ValueError(f"Cannot convert an array value in an array value: {path}")
+        with self._lock:
+            self.ops["writes"] += 1
+            current = self._store.get(path) if merge else None
+            if current is None:
+                current = {}
+            _merge(current, data)
+            self._store[path] = current
+            self._versions[path] = self._versions.get(path, 0) + 1
+
+    def _write_update(self, path, data):
+        with self._lock:
+            if path not in self._store:
+                raise NotFound(f"No document to update: {path}")
+            self.ops["writes"] += 1
+            _update(self._store[path], data)
+            self._versions[path] = self._versions.get(path, 0) + 1
+
+    def _write_delete(self, path):
+        with self._lock:
+            self.ops["writes"] += 1
+            self._store.pop(path, None)
+            self._versions[path] = self._versions.get(path, 0) + 1
+
+    def collection(self, name):
+        return FakeCollectionReference(self, name)
+
+    def collection_group(self, collection_id):
+        return FakeQuery(self, collection_id, all_descendants=True)
+
+    def document(self, path):
+        return FakeDocumentReference(self, path)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def transaction(self, **kwargs):
+        return FakeTransaction(self)
+
+    def get_all(self, references, field_paths=None, transaction=None):
+        references = list(references)
+        self._rpc("batch_get")
+        self.ops["reads"] += len(references)
+        for reference in references:
+            data = self._read(reference.path, transaction)
+            if data is not None and field_paths is not None:
+                data = {field: data[field] for field in field_paths if field in data}
+            self._count_bytes(data)
+            yield FakeSnapshot(reference, data)
+
+    def bulk_writer(self):
+        return FakeBulkWriter(self)
+
+    def recursive_delete(self, reference, bulk_writer=None, chunk_size=5000):
+        """
+        Delete a document or collection and all of its descendants. Like the
+        real client, this closes the writer when it is done, including one
+        passed in as ``bulk_writer``.
+        """
+        writer = bulk_writer or self.bulk_writer()
+        prefix = reference.path + "/"
+        with self._lock:
+            paths = [path for path in self._store if path.startswith(prefix)]
+            if isinstance(reference, FakeDocumentReference) and reference.path in self._store:
+                paths.append(reference.path)
+        for start in range(0, max(len(paths), 1), chunk_size):
+            self._rpc("query")
+            self.ops["reads"] += max(len(paths[start:start + chunk_size]), 1)
+        for path in paths:
+            writer.delete(FakeDocumentReference(self, path))
+        writer.close()
+        return len(paths)
+
+    def seed(self, path, data):
+        """Store a document directly, without latency or op accounting."""
+        with self._lock:
+            self._store[path] = {}
+            _merge(self._store[path], data)
+
+    def peek(self, path):
+        """Read a document directly, without latency or op accounting."""
+        return self._read(path)
+
+    def dump(self):
+        with self._lock:
+            return copy.deepcopy(self._store)
+
+
+# ---------------------------------------------------------------------------
+# Cloud Storage
+# ---------------------------------------------------------------------------
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.content_type = None
+        self.content_encoding = None
+
+    @property
+    def public_url(self):
+        return f"https://storage.googleapis.com/{self.bucket.name}/{self.name}"
+
+    @property
+    def size(self):
+        data = self.bucket._objects.get(self.name)
+        return len(data) if data is not None else None
+
+    def upload_from_string(self, data, content_type=None):
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        self.bucket._transfer("upload", len(data))
+        self.bucket._objects[self.name] = bytes(data)
+        self.bucket._encodings[self.name] = self.content_encoding
+        self.content_type = content_type
+        for callback in self.bucket.on_upload:
+            callback(self, data)
+
+    def upload_from_filename(self, filename, content_type=None):
+        try:
+            with open(filename, "rb") as handle:
+                data = handle.read()
+        except FileNotFoundError:
+            data = b""
+        self.upload_from_string(data, content_type=content_type)
+
+    def download_as_bytes(self, raw_download=False):
+        """Like the real client, objects stored with Content-Encoding gzip come back decoded."""
+        data = self.bucket._objects.get(self.name)
+        if data is None:
+            raise NotFound(f"No such object: {self.bucket.name}/{self.name}")
+        self.bucket._transfer("download", len(data))
+        if not raw_download and self.bucket._encodings.get(self.name) == "gzip":
+            return gzip.decompress(data)
+        return data
+
+    def exists(self):
+        self.bucket._transfer("exists", 0)
+        return self.name in self.bucket._objects
+
+    def make_public(self):
+        self.bucket._transfer("acl", 0)
+
+    def delete(self):
+        self.bucket._transfer("delete", 0)
+        self.bucket._objects.pop(self.name, None)
+        self.bucket._encodings.pop(self.name, None)
+
+
+class FakeBucket:
+    """
+    An in-memory bucket. ``bandwidth_mbps`` adds a size-dependent transfer
+    time on top of the per-request latency, and ``on_upload`` callbacks stand
+    in for Storage-triggered extensions.
+    """
+
+    def __init__(self, name="adaptive-learning-app-example.firebasestorage.app", latency=None,
+                 bandwidth_mbps=None):
+        self.name = name
+        self.latency = latency or Latency()
+        self.bandwidth_mbps = bandwidth_mbps
+        self.ops = Counter()
+        self.on_upload = []
+        self._objects = {}
+        self._encodings = {}
+
+    def _transfer(self, kind, size):
+        self.ops[kind] += 1
+        self.ops[f"{kind}_bytes"] += size
+        self.latency.sleep()
+        if self.bandwidth_mbps and size:
+            time.sleep(size * 8 / (self.bandwidth_mbps * 1_000_000))
+
+    def blob(self, name):
+        return FakeBlob(self, name)
+
+
+# ---------------------------------------------------------------------------
+# Firebase Auth
+# ---------------------------------------------------------------------------
+
+class FirebaseError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class EmailAlreadyExistsError(FirebaseError):
+    def __init__(self, message="The user with the provided email already exists"):
+        super().__init__("ALREADY_EXISTS", message)
+
+
+class UserNotFoundError(FirebaseError):
+    def __init__(self, message="No user record found for the given identifier"):
+        super().__init__("NOT_FOUND", message)
+
+
+class UserRecord:
+    def __init__(self, uid, email=None, password_hash=None, password_salt=None, disabled=False):
+        self.uid = uid
+        self.email = email
+        self.password_hash = password_hash
+        self.password_salt = password_salt
+        self.disabled = disabled
+
+    def __repr__(self):
+        return f"UserRecord(uid={self.uid!r}, email={self.email!r})"
+
+
+class ImportUserRecord(UserRecord):
+    pass
+
+
+class UserImportHash:
+    def __init__(self, name, **options):
+        self.name = name
+        self.options = options
+
+    @classmethod
+    def pbkdf2_sha256(cls, rounds):
+        return cls("PBKDF2_SHA256", rounds=rounds)
+
+    @classmethod
+    def bcrypt(cls):
+        return cls("BCRYPT")
+
+
+class ErrorInfo:
+    def __init__(self, index, reason):
+        self.index = index
+        self.reason = reason
+
+
+class BatchDeleteResult:
+    def __init__(self, errors, total):
+        self.errors = errors
+        self.failure_count = len(errors)
+        self.success_count = total - len(errors)
+
+
+class UserImportResult:
+    def __init__(self, errors, total):
+        self.errors = errors
+        self.failure_count = len(errors)
+        self.success_count = total - len(errors)
+
+
+class FakeAuth:
+    """Stands in for the ``firebase_admin.auth`` module."""
+
+    MAX_IMPORT_USERS_SIZE = 1000
+    MAX_DELETE_USERS_SIZE = 1000
+
+    EmailAlreadyExistsError = EmailAlreadyExistsError
+    UserNotFoundError = UserNotFoundError
+    ImportUserRecord = ImportUserRecord
+    UserImportHash = UserImportHash
+
+    def __init__(self, latency=None):
+        self.latency = latency or Latency()
+        self.ops = Counter()
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def _rpc(self, kind):
+        self.ops[kind] += 1
+        self.latency.sleep()
+
+    def create_user(self, uid=None, email=None, password=None, **kwargs):
+        self._rpc("create_user")
+        with self._lock:
+            if email and any(user.email == email for user in self._users.values()):
+                raise EmailAlreadyExistsError()
+            record = UserRecord(uid or uuid.uuid4().hex[:28], email=email)
+            self._users[record.uid] = record
+        return record
+
+    def get_user(self, uid):
+        self._rpc("get_user")
+        with self._lock:
+            if uid not in self._users:
+                raise UserNotFoundError()
+            return self._users[uid]
+
+    def delete_user(self, uid):
+        self._rpc("delete_user")
+        with self._lock:
+            if uid not in self._users:
+                raise UserNotFoundError()
+            del self._users[uid]
+
+    def delete_users(self, uids, force_delete=False):
+        """Like the real API, UIDs that do not exist count as successes."""
+        if len(uids) > self.MAX_DELETE_USERS_SIZE:
+            raise ValueError(f"uids parameter must have <= {self.MAX_DELETE_USERS_SIZE} entries.")
+        self._rpc("delete_users")
+        with self._lock:
+            for uid in uids:
+                self._users.pop(uid, None)
+        return BatchDeleteResult([], len(uids))
+
+    def import_users(self, users, hash_alg=None):
+        if len(users) > self.MAX_IMPORT_USERS_SIZE:
+            raise ValueError(f"Users list must not have more than {self.MAX_IMPORT_USERS_SIZE} elements.")
+        if hash_alg is None and any(user.password_hash for user in users):
+            raise ValueError("A UserImportHash is required to import users with passwords.")
+        self._rpc("import_users")
+        errors = []
+        with self._lock:
+            emails = {user.email for user in self._users.values()}
+            for index, user in enumerate(users):
+                if user.email and user.email in emails:
+                    errors.append(ErrorInfo(index, "The email address is already in use by another account."))
+                    continue
+                emails.add(user.email)
+                self._users[user.uid] = user
+        return UserImportResult(errors, len(users))
+
+    def seed(self, uid, email=None):
+        with self._lock:
+            self._users[uid] = UserRecord(uid, email=email)
+        return self._users[uid]
+
+
+# ---------------------------------------------------------------------------
+# OpenAI and httpx
+# ---------------------------------------------------------------------------
+
+class _FakeObject:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class _FakeCompletions:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, model=None, messages=None, **kwargs):
+        self._client._rpc("chat.completions")
+        message = _FakeObject(role="assistant", content="{}")
+        return _FakeObject(choices=[_FakeObject(index=0, message=message, finish_reason="stop")],
+                           usage=_FakeObject(prompt_tokens=1000, completion_tokens=500, total_tokens=1500))
+
+
+class _FakeSpeech:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, model=None, voice=None, input="", **kwargs):
+        self._client._rpc("audio.speech")
+        return _FakeObject(content=b"RIFF" + b"\x00" * 40, read=lambda: b"RIFF" + b"\x00" * 40)
+
+
+class _FakeTranscriptions:
+    def __init__(self, client):
+        self._client = client
+
+    def create(self, model=None, file=None, **kwargs):
+        self._client._rpc("audio.transcriptions")
+        return _FakeObject(text="Parallel computing splits a task across processors.")
+
+
+class FakeOpenAI:
+    """A drop-in for ``openai.OpenAI`` whose endpoints return canned payloads."""
+
+    def __init__(self, latency=None, **kwargs):
+        self.latency = latency or Latency()
+        self.api_key = kwargs.get("api_key")
+        self.ops = Counter()
+        self.chat = _FakeObject(completions=_FakeCompletions(self))
+        self.audio = _FakeObject(speech=_FakeSpeech(self), transcriptions=_FakeTranscriptions(self))
+
+    def _rpc(self, kind):
+        self.ops[kind] += 1
+        self.latency.sleep()
+
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self._payload = payload
+        self.status_code = status_code
+
+    def json(self):
+        return self._payload
+
+
+class FakeAsyncClient:
+    """A drop-in for ``httpx.AsyncClient`` used by outbound calls from the routes."""
+
+    latency = Latency()
+    ops = Counter()
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def post(self, url, **kwargs):
+        type(self).ops["post"] += 1
+        await type(self).latency.asleep()
+        return FakeResponse({"id": f"sess_{uuid.uuid4().hex[:12]}", "client_secret": {"value": "ek_fake"}})
@@ -0,0 +1,360 @@
+"""
+Wires the fakes into the app so the real routes can be driven offline.
+
+``firebaseHandling`` initializes ``firebase_admin`` at import time and
+``api_routes`` builds an OpenAI client at import time, so the fakes have to be
+registered in ``sys.modules`` before the app package is imported. After that,
+``Harness.reset`` swaps in a fresh set of services for each scenario.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+import uuid
+from collections import Counter
+
+from . import fakes
+
+PROFILES = {
+    "zero": {
+        "firestore": "constant:0",
+        "storage": "constant:0",
+        "auth": "constant:0",
+        "openai": "constant:0",
+        "model": "constant:0",
+        "ocr": "constant:0",
+    },
+    "local": {
+        "firestore": "lognormal:4,0.4",
+        "storage": "lognormal:15,0.5",
+        "auth": "lognormal:25,0.4",
+        "openai": "lognormal:40,0.3",
+        "model": "constant:10",
+        "ocr": "lognormal:600,0.3",
+    },
+    "cloud": {
+        "firestore": "lognormal:12,0.6",
+        "storage": "lognormal:60,0.6",
+        "auth": "lognormal:90,0.5",
+        "openai": "lognormal:1500,0.4",
+        "model": "constant:40",
+        "ocr": "lognormal:1500,0.4",
+    },
+}
+
+LEARNING_STYLES = ["Auditory", "Kinesthetic", "Visual"]
+
+# On top of the "ocr" latency, the extraction extension takes longer for larger images.
+OCR_SECONDS_PER_MB = 0.25
+
+
+class FakeServices:
+    """One set of backend fakes sharing a latency profile."""
+
+    def __init__(self, latencies, seed=0):
+        self.latencies = {name: fakes.Latency.parse(spec, seed=seed + i)
+                          for i, (name, spec) in enumerate(sorted(latencies.items()))}
+        self.db = fakes.FakeFirestore(self.latencies["firestore"])
+        self.bucket = fakes.FakeBucket(latency=self.latencies["storage"])
+        self.auth = fakes.FakeAuth(self.latencies["auth"])
+        self.openai = fakes.FakeOpenAI(self.latencies["openai"])
+        self.http_client = type("FakeAsyncClient", (fakes.FakeAsyncClient,),
+                                {"latency": self.latencies["openai"], "ops": Counter()})
+        self.model = Counter()
+        self.ocr = Counter()
+        self.bucket.on_upload.append(self._simulate_ocr)
+
+    def _simulate_ocr(self, blob, data):
+        """Write an extractedText document some time after an image lands, like the OCR extension."""
+        if not blob.name.startswith("images/"):
+            return
+        self.ocr["extractions"] += 1
+        delay = self.latencies["ocr"].sample() + len(data) / 1_000_000 * OCR_SECONDS_PER_MB
+        extracted = {"file": f"gs://{self.bucket.name}/{blob.name}",
+                     "extractedText": "Parallel computing splits a task across processors. " * 40}
+        timer = threading.Timer(delay, self.db.seed, args=(f"extractedText/{uuid.uuid4().hex[:20]}", extracted))
+        timer.daemon = True
+        timer.start()
+
+    def counters(self):
+        """Snapshot every call counter, keyed as ``service.op``."""
+        snapshot = Counter()
+        for service, ops in (("firestore", self.db.ops), ("storage", self.bucket.ops),
+                             ("auth", self.auth.ops), ("openai", self.openai.ops),
+                             ("http", self.http_client.ops), ("model", self.model), ("ocr", self.ocr)):
+            for op, count in ops.items():
+                snapshot[f"{service}.{op}"] = count
+        return snapshot
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+class Harness:
+    """
+    Imports ``app.api_routes.api_routes`` against the fakes and exposes a
+    FastAPI app built from its router.
+
+    Args:
+        latencies (dict): Latency spec per service (see ``PROFILES``).
+        use_real_model (bool): Load the Keras classifier instead of faking it.
+    """
+
+    def __init__(self, latencies, use_real_model=False):
+        self.latencies = latencies
+        self.use_real_model = use_real_model
+        self.services = None
+        self.app = None
+        self._workdir = tempfile.mkdtemp(prefix="bench_")
+
+    # -- module stand-ins ---------------------------------------------------
+
+    def _install_firebase(self):
+        harness = self
+        firestore_v1 = _module(
+            "google.cloud.firestore_v1",
+            SERVER_TIMESTAMP=fakes.SERVER_TIMESTAMP,
+            DELETE_FIELD=fakes.DELETE_FIELD,
+            ArrayUnion=fakes.ArrayUnion,
+            ArrayRemove=fakes.ArrayRemove,
+            Increment=fakes.Increment,
+            FieldFilter=fakes.FieldFilter,
+        )
+        firestore = _module(
+            "firebase_admin.firestore",
+            client=lambda app=None: harness.services.db,
+            transactional=fakes.transactional,
+            FieldFilter=fakes.FieldFilter,
+            SERVER_TIMESTAMP=fakes.SERVER_TIMESTAMP,
+            ArrayUnion=fakes.ArrayUnion,
+            ArrayRemove=fakes.ArrayRemove,
+            Increment=fakes.Increment,
+        )
+        storage = _module("firebase_admin.storage", bucket=lambda name=None, app=None: harness.services.bucket)
+        credentials = _module("firebase_admin.credentials", Certificate=lambda path: path)
+        exceptions = _module("firebase_admin.exceptions", FirebaseError=fakes.FirebaseError)
+        firebase_admin = _module(
+            "firebase_admin",
+            initialize_app=lambda *args, **kwargs: None,
+            credentials=credentials,
+            firestore=firestore,
+            storage=storage,
+            exceptions=exceptions,
+            auth=self.services.auth,
+        )
+        firebase_admin.__path__ = []
+        sys.modules.update({
+            "firebase_admin": firebase_admin,
+            "firebase_admin.credentials": credentials,
+            "firebase_admin.firestore": firestore,
+            "firebase_admin.storage": storage,
+            "firebase_admin.exceptions": exceptions,
+            "firebase_admin.auth": self.services.auth,
+            "google.cloud.firestore_v1": firestore_v1,
+        })
+
+    def _install_openai(self):
+        harness = self
+        sys.modules["openai"] = _module(
+            "openai",
+            OpenAI=lambda *args, **kwargs: harness.services.openai,
+            AsyncOpenAI=lambda *args, **kwargs: harness.services.openai,
+        )
+
+    def _install_app_services(self):
+        """Stand in for the app modules that call OpenAI or read local media."""
+        harness = self
+        transcript_path = os.path.join(self._workdir, "transcript.txt")
+        with open(transcript_path, "w") as handle:
+            handle.write("Welcome to TechTalk. Today we cover parallel and grid computing.")
+
+        def openai_json(kind, payload):
+            async def generate(tokens):
+                harness.services.openai.ops[kind] += 1
+                await harness.services.latencies["openai"].asleep()
+                return "", payload, 1200, 600
+            return generate
+
+        async def get_module_content_from_openai(tokens):
+            harness.services.openai.ops["module"] += 1
+            await harness.services.latencies["openai"].asleep()
+            module_json = {"title": "Parallel and Grid Computing", "description": "An introduction."}
+            return tokens or "", module_json, "https://example.com/cover.png", 1500, 400
+
+        def text_to_speech(script):
+            harness.services.openai.ops["tts"] += 1
+            harness.services.latencies["openai"].sleep()
+            return os.path.join(harness._workdir, "combined_audio.wav"), 4000
+
+        def speech_to_text(path, return_transcript=False):
+            harness.services.openai.ops["stt"] += 1
+            harness.services.latencies["openai"].sleep()
+            if return_transcript:
+                return types.SimpleNamespace(text="Parallel computing splits a task across processors.")
+            return transcript_path, 5.0
+
+        def extract_tokens_from_pdf(file_content):
+            return "Parallel computing splits a task across processors. " * 200
+
+        flashcards = {"flashcards": [{"front": f"Term {i}", "back": f"Definition {i}"} for i in range(20)]}
+        mindmap = {"root": "Parallel Computing", "children": [{"name": f"Topic {i}"} for i in range(10)]}
+        quiz = {"questions": [{"question": f"Q{i}?", "options": ["A", "B", "C", "D"], "answer": "A"}
+                              for i in range(10)]}
+        podcast = {"title": "TechTalk", "script": [{"text": "Hello!", "generate": True, "voice": "echo"}]}
+
+        stand_ins = {
+            "app.config": _module("app.config", OPENAI_API_KEY="sk-offline"),
+            "app.openaiCustomAPI": _module("app.openaiCustomAPI", __path__=[]),
+            "app.openaiCustomAPI.text_to_speech": _module("app.openaiCustomAPI.text_to_speech",
+                                                          text_to_speech=text_to_speech),
+            "app.openaiCustomAPI.speech_to_text": _module("app.openaiCustomAPI.speech_to_text",
+                                                          speech_to_text=speech_to_text),
+            "app.openaiCustomAPI.generate_content": _module(
+                "app.openaiCustomAPI.generate_content",
+                get_flashcard_json_from_openai=openai_json("flashcards", flashcards),
+                get_mindmap_json_from_openai=openai_json("mindmap", mindmap),
+                get_quiz_json_from_openai=openai_json("quiz", quiz),
+                get_podcast_json_from_openai=openai_json("podcast", podcast),
+                get_module_content_from_openai=get_module_content_from_openai,
+            ),
+            "app.tokenExtractor": _module("app.tokenExtractor", __path__=[]),
+            "app.tokenExtractor.pdf_extractor": _module("app.tokenExtractor.pdf_extractor",
+                                                        extract_tokens_from_pdf=extract_tokens_from_pdf),
+        }
+        if not self.use_real_model:
+            def predict_learning_style(answers):
+                harness.services.model["predict"] += 1
+                harness.services.latencies["model"].sleep()
+                return [{"predicted_class": LEARNING_STYLES[len(answer) % 3], "confidence": 0.5 + (len(answer) % 5) / 10}
+                        for answer in answers]
+
+            stand_ins["app.model_utils.predict_learning_style"] = _module(
+                "app.model_utils.predict_learning_style", predict_learning_style=predict_learning_style)
+        sys.modules.update(stand_ins)
+
+    # -- lifecycle ----------------------------------------------------------
+
+    def install(self):
+        """Register the fakes, import the routes and build the ASGI app."""
+        from fastapi import FastAPI
+
+        self.services = FakeServices(self.latencies)
+        self._install_firebase()
+        self._install_openai()
+        self._install_app_services()
+
+        from app.api_routes import api_routes
+        from app.firebaseHandling import firebaseHandling
+
+        self.api_routes = api_routes
+        self.firebase_handling = firebaseHandling
+        self._route_helpers = {"preprocess_images": api_routes.preprocess_images}
+        self.app = FastAPI()
+        self.app.include_router(api_routes.api_router)
+        self.reset()
+        return self
+
+    def reset(self):
+        """Give the next scenario an empty store and zeroed counters."""
+        self.services = FakeServices(self.latencies)
+        self.firebase_handling.db = self.services.db
+        self.firebase_handling.bucket = self.services.bucket
+        self.firebase_handling.auth = self.services.auth
+        self.api_routes.bucket = self.services.bucket
+        self.api_routes.openai_client = self.services.openai
+        self.api_routes.httpx = types.SimpleNamespace(AsyncClient=self.services.http_client)
+        self.patch_routes()
+        return self.services
+
+    def patch_routes(self, **overrides):
+        """Point the routes at their real helpers, except for ``overrides``."""
+        for name, helper in self._route_helpers.items():
+            setattr(self.api_routes, name, overrides.get(name, helper))
+
+
+def percentile(sorted_values, pct):
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(name, latencies, errors, elapsed, counters, items_per_request=1):
+    latencies = sorted(latencies)
+    completed = len(latencies)
+    per_request = {op: count / completed for op, count in sorted(counters.items()) if completed}
+    return {
+        "scenario": name,
+        "requests": completed,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "rps": completed / elapsed if elapsed else 0.0,
+        "items_per_s": completed * items_per_request / elapsed if elapsed else 0.0,
+        "mean_ms": 1000 * sum(latencies) / completed if completed else 0.0,
+        "p50_ms": 1000 * percentile(latencies, 50),
+        "p95_ms": 1000 * percentile(latencies, 95),
+        "p99_ms": 1000 * percentile(latencies, 99),
+        "max_ms": 1000 * latencies[-1] if latencies else 0.0,
+        "ops_per_request": per_request,
+    }
+
+
+async def run_load(harness, scenario, requests, concurrency, warmup=0):
+    """
+    Drive ``scenario`` against the in-process app with a closed loop of
+    ``concurrency`` workers until ``requests`` requests have completed. The
+    scenario's ``route_patches`` are undone when it finishes.
+    """
+    services = harness.reset()
+    harness.patch_routes(**scenario.route_patches)
+    try:
+        return await _drive(harness, scenario, services, requests, concurrency, warmup)
+    finally:
+        harness.patch_routes()
+
+
+async def _drive(harness, scenario, services, requests, concurrency, warmup):
+    import httpx
+
+    scenario.seed(services)
+    transport = httpx.ASGITransport(app=harness.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for i in range(warmup):
+            await client.request(**scenario.build_request(i))
+
+        before = services.counters()
+        latencies = []
+        errors = 0
+        remaining = iter(range(warmup, warmup + requests))
+
+        async def worker():
+            nonlocal errors
+            for i in remaining:
+                request = scenario.build_request(i)
+                started = time.perf_counter()
+                try:
+                    response = await client.request(**request)
+                    failed = response.status_code >= 400
+                except Exception as e:
+                    print(f"{scenario.name} request {i} failed: {e}")
+                    failed = True
+                latencies.append(time.perf_counter() - started)
+                errors += failed
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    counters = services.counters()
+    counters.subtract(before)
+    return summarize(scenario.name, latencies, errors, elapsed, +counters, scenario.items_per_request)
@@ -0,0 +1,331 @@
+"""
+Load scenarios. Each scenario seeds the fake store and builds the keyword
+arguments for ``httpx.AsyncClient.request`` for the i-th request.
+"""
+
+import functools
+import io
+
+ANSWERS = [
+    "I remember things best when I see diagrams and charts",
+    "I like to listen to lectures and discuss ideas out loud",
+    "I learn by doing experiments and building things with my hands",
+    "Colour coded notes help me revise",
+]
+
+ADMIN_UID = "admin-bench"
+
+
+def _seed_class(services, students, submodules=4):
+    db = services.db
+    student_uids = [f"student-{i:05d}" for i in range(students)]
+    db.seed(f"users/{ADMIN_UID}", {"email": "teacher@example.com", "admin": True, "my_students": student_uids})
+    for uid in student_uids:
+        services.auth.seed(uid, email=f"{uid}@example.com")
+        db.seed(f"users/{uid}", {"email": f"{uid}@example.com", "admin": False})
+    submodule_ids = [f"submodule-{i}" for i in range(submodules)]
+    for submodule_id in submodule_ids:
+        db.seed(f"submodules/{submodule_id}", {"name": submodule_id, "moduleId": "module-bench"})
+    db.seed("modules/module-bench", {"name": "Bench module", "createdBy": [ADMIN_UID], "submodules": submodule_ids})
+    return student_uids
+
+
+class Scenario:
+    name = None
+    # Rows each request carries, for endpoints that take batches.
+    items_per_request = 1
+    # Replacements for api_routes helpers, applied only while this scenario runs.
+    route_patches = {}
+
+    def seed(self, services):
+        pass
+
+    def build_request(self, i):
+        raise NotImplementedError
+
+
+class PredictLearningStyle(Scenario):
+    name = "predict-learning-style"
+
+    def build_request(self, i):
+        answers = [{"answer": ANSWERS[(i + n) % len(ANSWERS)]} for n in range(16)]
+        return {"method": "POST", "url": "/predict-learning-style", "json": {"answers": answers}}
+
+
+class UploadFile(Scenario):
+    name = "upload-file"
+
+    def __init__(self, preference="Kinesthetic,Visual,Auditory"):
+        self.preference = preference
+
+    def build_request(self, i):
+        pdf = b"%PDF-1.4\n" + b"0" * 64 * 1024 + b"\n%%EOF"
+        return {
+            "method": "POST",
+            "url": "/upload-file",
+            "data": {"useruid": f"student-{i % 50:05d}", "submodulepreference": self.preference},
+            "files": {"file": ("notes.pdf", pdf, "application/pdf")},
+        }
+
+
+class AddUsersToModule(Scenario):
+    name = "addUsersToModule"
+
+    def __init__(self, students=200, batch=25):
+        self.students = students
+        self.batch = batch
+        self.student_uids = []
+
+    def seed(self, services):
+        self.student_uids = _seed_class(services, self.students)
+
+    def build_request(self, i):
+        start = (i * self.batch) % self.students
+        user_ids = (self.student_uids * 2)[start:start + self.batch]
+        return {
+            "method": "POST",
+            "url": "/addUsersToModule",
+            "json": {"moduleId": "module-bench", "userIds": user_ids, "adminUid": ADMIN_UID},
+        }
+
+
+class AdminStudents(Scenario):
+    name = "admin-students"
+
+    def __init__(self, students=30):
+        self.students = students
+
+    def seed(self, services):
+        _seed_class(services, self.students)
+
+    def build_request(self, i):
+        return {"method": "GET", "url": f"/admin/{ADMIN_UID}/students"}
+
+
+class SignUpUsers(Scenario):
+    name = "signup-users"
+
+    def seed(self, services):
+        _seed_class(services, 0)
+
+    def build_request(self, i):
+        return {
+            "method": "POST",
+            "url": "/signup-users",
+            "json": {"email": f"pupil-{i:06d}@example.com", "password": "correct-horse", "adminUid": ADMIN_UID},
+        }
+
+
+class SignUpUsersBulk(Scenario):
+    name = "signup-users-bulk"
+
+    def __init__(self, rows=500):
+        self.items_per_request = rows
+
+    def seed(self, services):
+        _seed_class(services, 0)
+
+    def build_request(self, i):
+        users = [{"email": f"pupil-{i:04d}-{n:05d}@example.com", "password": "correct-horse"}
+                 for n in range(self.items_per_request)]
+        return {"method": "POST", "url": "/signup-users/bulk", "json": {"users": users, "adminUid": ADMIN_UID}}
+
+
+class DeleteUsersBulk(Scenario):
+    """
+    Each request deletes a fresh cohort with progress docs, roster entries and
+    module membership. The timing includes the background job, which the ASGI
+    transport runs before the response completes.
+    """
+    name = "delete-users-bulk"
+
+    def __init__(self, rows=200, submodules=4):
+        self.items_per_request = rows
+        self.submodules = submodules
+        self.services = None
+
+    def seed(self, services):
+        self.services = services
+        _seed_class(services, 0, self.submodules)
+
+    def build_request(self, i):
+        db = self.services.db
+        uids = [f"leaver-{i:04d}-{n:05d}" for n in range(self.items_per_request)]
+        for uid in uids:
+            self.services.auth.seed(uid, email=f"{uid}@example.com")
+            db.seed(f"users/{uid}", {"email": f"{uid}@example.com", "admin": False})
+            for s in range(self.submodules):
+                db.seed(f"userProgress/{uid}/submoduleProgress/submodule-{s}", {"completionPercentage": 0})
+        admin = db.peek(f"users/{ADMIN_UID}")
+        db.seed(f"users/{ADMIN_UID}", {**admin, "my_students": admin["my_students"] + uids})
+        module = db.peek("modules/module-bench")
+        db.seed("modules/module-bench", {**module, "createdBy": module["createdBy"] + uids})
+        return {"method": "POST", "url": "/users/delete-bulk", "json": {"userIds": uids}}
+
+
+def _seed_modules(services, owner, modules):
+    """Create modules through the app itself, so they use its storage layout."""
+    from app.firebaseHandling.firebaseHandling import create_module_with_submodules
+
+    flashcards = {"flashcards": [{"front": f"Term {i}", "back": "A definition. " * 10} for i in range(40)]}
+    quiz = {"questions": [{"question": f"Q{i}?", "options": ["A", "B", "C", "D"], "answer": "A"}
+                          for i in range(20)]}
+    submodule_ids = []
+    for m in range(modules):
+        module_data = {"name": f"Module {m}", "description": "Bench module", "progress": 0,
+                       "content": "Parallel computing splits a task across processors. " * 600,
+                       "image": "https://example.com/cover.png"}
+        submodules = [
+            {"name": "Flash Cards", "description": "Flash cards", "type": "kinaesthetic", "lessonData": flashcards},
+            {"name": "Multiple Choice Quiz", "description": "Quiz", "type": "quiz", "lessonData": quiz},
+        ]
+        submodule_ids += create_module_with_submodules(owner, module_data, submodules)["submodules"]
+    return submodule_ids
+
+
+class UserModules(Scenario):
+    name = "user-modules"
+
+    def __init__(self, modules=20):
+        self.modules = modules
+
+    def seed(self, services):
+        _seed_modules(services, ADMIN_UID, self.modules)
+
+    def build_request(self, i):
+        return {"method": "GET", "url": f"/user/{ADMIN_UID}/modules"}
+
+
+class SubmoduleLesson(Scenario):
+    name = "submodule-lesson"
+
+    def __init__(self, modules=5):
+        self.modules = modules
+        self.submodule_ids = []
+
+    def seed(self, services):
+        self.submodule_ids = _seed_modules(services, ADMIN_UID, self.modules)
+
+    def build_request(self, i):
+        return {"method": "GET", "url": f"/submodules/{self.submodule_ids[i % len(self.submodule_ids)]}/lesson"}
+
+
+def _seed_class_modules(services, students, modules, submodules=4):
+    """Seed a class enrolled in several modules with partial progress, then backfill the aggregates."""
+    from app.firebaseHandling.firebaseHandling import backfill_progress_aggregates
+
+    db = services.db
+    student_uids = _seed_class(services, students, submodules)
+    submodule_ids = []
+    for m in range(modules):
+        module_id = f"class-module-{m}"
+        ids = [f"{module_id}-sub-{s}" for s in range(submodules)]
+        submodule_ids += ids
+        db.seed(f"modules/{module_id}", {"name": f"Module {m}", "createdBy": [ADMIN_UID] + student_uids,
+                                         "submodules": ids})
+        for s, submodule_id in enumerate(ids):
+            db.seed(f"submodules/{submodule_id}", {"name": submodule_id, "moduleId": module_id})
+            for n, uid in enumerate(student_uids):
+                db.seed(f"userProgress/{uid}/submoduleProgress/{submodule_id}",
+                        {"completionPercentage": (n * 37 + s * 11 + m * 5) % 101})
+    backfill_progress_aggregates()
+    return student_uids, submodule_ids
+
+
+class ClassProgress(Scenario):
+    name = "class-progress"
+
+    def __init__(self, students=30, modules=8):
+        self.students = students
+        self.modules = modules
+
+    def seed(self, services):
+        _seed_class_modules(services, self.students, self.modules)
+
+    def build_request(self, i):
+        return {"method": "GET", "url": f"/admin/{ADMIN_UID}/class-progress"}
+
+
+class UpdateProgress(Scenario):
+    """Concurrent progress updates contend on each module's classStats document."""
+    name = "update-progress"
+
+    def __init__(self, students=30, modules=4):
+        self.students = students
+        self.modules = modules
+
+    def seed(self, services):
+        self.student_uids, self.submodule_ids = _seed_class_modules(services, self.students, self.modules)
+
+    def build_request(self, i):
+        return {
+            "method": "POST",
+            "url": "/updateSubmoduleProgress",
+            "json": {"userUid": self.student_uids[i % len(self.student_uids)],
+                     "submoduleId": self.submodule_ids[(i * 7) % len(self.submodule_ids)],
+                     "completionPercentage": (i * 13) % 101},
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def sample_page_photo(seed=0, size=(3024, 4032)):
+    """
+    A local stand-in for a phone photo of a page of notes: a 12 MP JPEG of
+    text lines on a noisy, off-white background, stored sideways with an EXIF
+    orientation tag the way phone cameras do.
+    """
+    from PIL import Image, ImageChops, ImageDraw
+
+    width, height = size
+    page = Image.new("RGB", (height, width), (236, 232, 221))
+    draw = ImageDraw.Draw(page)
+    for line, y in enumerate(range(120, width - 120, 90)):
+        draw.text((150, y), f"{seed}.{line} Parallel computing splits a task across processors " * 2,
+                  fill=(40, 40, 48))
+    noise = Image.effect_noise(page.size, 18).convert("RGB")
+    page = ImageChops.add(page, noise, scale=1.0, offset=-128)
+
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 CW to display
+    output = io.BytesIO()
+    page.save(output, format="JPEG", quality=95, exif=exif)
+    return output.getvalue()
+
+
+class UploadImages(Scenario):
+    """Multi-page photo upload through /upload-file, including OCR and module generation."""
+    name = "upload-images"
+
+    def __init__(self, pages=3):
+        self.items_per_request = pages
+
+    def seed(self, services):
+        self.pages = [sample_page_photo(n) for n in range(self.items_per_request)]
+
+    def build_request(self, i):
+        files = [("file", ("page-0.jpg", self.pages[0], "image/jpeg"))]
+        files += [("files", (f"page-{n}.jpg", page, "image/jpeg")) for n, page in enumerate(self.pages[1:], 1)]
+        return {
+            "method": "POST",
+            "url": "/upload-file",
+            "data": {"useruid": f"student-{i % 50:05d}", "submodulepreference": "Kinesthetic,Visual,Auditory"},
+            "files": files,
+        }
+
+
+async def _upload_unchanged(contents):
+    return list(contents)
+
+
+class UploadImagesRaw(UploadImages):
+    """The same upload with preprocessing switched off, for comparison."""
+    name = "upload-images-raw"
+    route_patches = {"preprocess_images": _upload_unchanged}
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (PredictLearningStyle, UploadFile, AddUsersToModule, AdminStudents,
+                     SignUpUsers, SignUpUsersBulk, DeleteUsersBulk, UserModules, SubmoduleLesson,
+                     ClassProgress, UpdateProgress, UploadImages, UploadImagesRaw)
+}
@@ -0,0 +1,24 @@
+"""
+Fixtures that run the app against the in-memory fakes from benchmarks/, so
+Firebase-backed code can be tested without credentials or network access.
+"""
+
+import pytest
+
+from benchmarks.harness import PROFILES, Harness
+
+
+@pytest.fixture(scope="session")
+def harness():
+    return Harness(PROFILES["zero"]).install()
+
+
+@pytest.fixture
+def services(harness):
+    """A fresh, empty set of fake services for each test."""
+    return harness.reset()
+
+
+@pytest.fixture
+def fh(harness, services):
+    return harness.firebase_handling
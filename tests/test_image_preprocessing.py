@@ -0,0 +1,76 @@
+import io
+from pathlib import Path
+
+from PIL import Image
+
+from app.imageProcessing.image_preprocessing import OCR_MAX_SIDE, preprocess_image
+
+DATA_DIR = Path(__file__).parent / "data"
+
+
+def _load(name):
+    return (DATA_DIR / name).read_bytes()
+
+
+def _decode(content):
+    return Image.open(io.BytesIO(content))
+
+
+def test_sideways_photo_is_rotated_scaled_and_grayscale():
+    # Stored as 2400x1600 with EXIF orientation 6 and a red marker in the
+    # stored top-left corner, which ends up top-right once displayed upright.
+    original = _load("sideways_page.jpg")
+
+    processed = preprocess_image(original)
+    image = _decode(processed)
+
+    assert image.format == "JPEG"
+    assert image.mode == "L"
+    assert image.width < image.height
+    assert max(image.size) <= OCR_MAX_SIDE
+    assert image.getpixel((image.width - 5, 5)) < 150
+    assert image.getpixel((5, 5)) > 200
+    assert len(processed) < len(original)
+
+
+def test_transparent_png_is_flattened_onto_white():
+    original = _load("transparent_text.png")
+
+    # Flattened even though the JPEG is larger than this small PNG.
+    processed = preprocess_image(original)
+    image = _decode(processed)
+
+    assert image.format == "JPEG"
+    assert image.mode == "L"
+    darkest, lightest = image.getextrema()
+    assert image.getpixel((2, 2)) > 240
+    assert darkest < 64
+    assert lightest > 240
+
+
+def test_small_sideways_photo_is_rotated_even_if_not_smaller():
+    page = _decode(_load("sideways_page.jpg"))
+    exif = page.getexif()
+    page.thumbnail((600, 600))
+    output = io.BytesIO()
+    page.save(output, format="JPEG", quality=30, exif=exif)
+    original = output.getvalue()
+
+    image = _decode(preprocess_image(original))
+
+    assert image.width < image.height
+    assert image.getpixel((image.width - 2, 2)) < 150
+
+
+def test_small_upright_image_that_would_grow_is_returned_unchanged():
+    output = io.BytesIO()
+    Image.new("L", (200, 100), 255).save(output, format="PNG")
+    original = output.getvalue()
+
+    assert preprocess_image(original) is original
+
+
+def test_undecodable_input_is_returned_unchanged():
+    content = b"%PDF-1.4\nnot an image"
+
+    assert preprocess_image(content) is content
@@ -0,0 +1,27 @@
+import io
+
+from PIL import Image
+
+
+def _encode(format):
+    output = io.BytesIO()
+    Image.new("RGB", (40, 20), "white").save(output, format=format)
+    return output.getvalue()
+
+
+def test_image_type_follows_the_bytes(fh):
+    assert fh._image_type(_encode("JPEG")) == ("image/jpeg", "jpg")
+    assert fh._image_type(_encode("PNG")) == ("image/png", "png")
+    assert fh._image_type(b"RIFF\x24\x00\x00\x00WEBPVP8 ") == ("image/webp", "webp")
+    assert fh._image_type(b"%PDF-1.4") == ("application/octet-stream", "bin")
+
+
+def test_png_is_uploaded_as_png(fh, services):
+    uploads = []
+    services.bucket.on_upload.append(lambda blob, data: uploads.append((blob.name, blob.content_type)))
+
+    assert fh.extract_text_from_image(_encode("PNG"))
+
+    [(name, content_type)] = uploads
+    assert name.startswith("images/") and name.endswith(".png")
+    assert content_type == "image/png"
@@ -0,0 +1,100 @@
+"""
+Checks that the classStats counters kept up incrementally by the app agree
+with what backfill_progress_aggregates rebuilds from the progress documents.
+Runs against the in-memory fakes from benchmarks/ (see conftest.py).
+"""
+
+from benchmarks.scenarios import ADMIN_UID, _seed_class
+
+COUNTERS = ("students", "startedStudents", "completedStudents", "progressSum")
+
+
+def _class_stats(db):
+    return {path: {field: round(data.get(field, 0), 6) for field in COUNTERS}
+            for path, data in db.dump().items() if "/classStats/" in path}
+
+
+def _assert_matches_backfill(fh, db):
+    incremental = _class_stats(db)
+    fh.backfill_progress_aggregates()
+    rebuilt = _class_stats(db)
+    # The backfill drops stats of classes with no students; an empty one is equivalent.
+    empty = {field: 0 for field in COUNTERS}
+    for path in incremental.keys() - rebuilt.keys():
+        assert incremental.pop(path) == empty
+    assert incremental == rebuilt
+    for stats in rebuilt.values():
+        assert all(value >= 0 for value in stats.values())
+
+
+def _enrol_with_progress(fh, services, students=6):
+    student_uids = _seed_class(services, students)
+    fh.add_users_to_module("module-bench", list(student_uids), ADMIN_UID)
+    for n, uid in enumerate(student_uids):
+        fh.update_submodule_progress(uid, "submodule-0", 100)
+        fh.update_submodule_progress(uid, "submodule-1", n * 20)
+    for submodule_id in ("submodule-1", "submodule-2", "submodule-3"):
+        fh.update_submodule_progress(student_uids[0], submodule_id, 100)
+    return student_uids
+
+
+def test_progress_updates_match_backfill(fh, services):
+    _enrol_with_progress(fh, services)
+
+    [module] = fh.get_class_progress(ADMIN_UID)
+    assert module["students"] == 6
+    assert module["completedStudents"] == 1
+    assert module["startedStudents"] == 5
+    _assert_matches_backfill(fh, services.db)
+
+
+def test_re_adding_members_drops_stale_aggregates(fh, services):
+    student_uids = _enrol_with_progress(fh, services, students=3)
+
+    fh.add_users_to_module("module-bench", [student_uids[0]], ADMIN_UID)
+    assert services.db.peek(f"userProgress/{student_uids[1]}/moduleProgress/module-bench") is None
+    job_id = fh.start_user_deletion_job([student_uids[1]])
+    fh.delete_users_bulk(job_id, [student_uids[1]])
+
+    [module] = fh.get_class_progress(ADMIN_UID)
+    assert (module["students"], module["startedStudents"], module["completedStudents"]) == (1, 0, 0)
+    _assert_matches_backfill(fh, services.db)
+
+
+def test_adding_to_a_module_keeps_students_in_their_class(fh, services):
+    student_uids = _seed_class(services, 2)
+    services.db.seed("users/other-admin", {"email": "other@example.com", "admin": True,
+                                           "my_students": [student_uids[0]]})
+    services.db.seed(f"users/{student_uids[0]}", {"email": "moved@example.com", "adminUid": "other-admin"})
+
+    fh.add_users_to_module("module-bench", list(student_uids), ADMIN_UID)
+    fh.update_submodule_progress(student_uids[0], "submodule-0", 100)
+
+    assert services.db.peek(f"users/{student_uids[0]}")["adminUid"] == "other-admin"
+    assert services.db.peek(f"users/{student_uids[1]}")["adminUid"] == ADMIN_UID
+    other = services.db.peek("modules/module-bench/classStats/other-admin")
+    assert (other["students"], other["startedStudents"]) == (1, 1)
+    assert services.db.peek(f"modules/module-bench/classStats/{ADMIN_UID}")["students"] == 1
+    _assert_matches_backfill(fh, services.db)
+
+
+def test_bulk_delete_subtracts_from_class_stats(fh, services):
+    student_uids = _enrol_with_progress(fh, services)
+
+    job_id = fh.start_user_deletion_job(student_uids[:3])
+    fh.delete_users_bulk(job_id, student_uids[:3])
+
+    assert fh.get_user_deletion_job(job_id)["status"] == "completed"
+    [module] = fh.get_class_progress(ADMIN_UID)
+    assert (module["students"], module["completedStudents"]) == (3, 0)
+    _assert_matches_backfill(fh, services.db)
+
+
+def test_single_delete_subtracts_from_class_stats(fh, services):
+    student_uids = _enrol_with_progress(fh, services)
+
+    fh.delete_user(student_uids[0])
+
+    [module] = fh.get_class_progress(ADMIN_UID)
+    assert (module["students"], module["completedStudents"]) == (5, 0)
+    _assert_matches_backfill(fh, services.db)